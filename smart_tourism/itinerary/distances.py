@@ -0,0 +1,104 @@
+"""
+Destination-to-destination distance matrix.
+
+All the pairwise distances between Destination rows are computed once with
+the great-circle formula and stored in one flat float array (row-major,
+indexed through a destination id -> position map), so a lookup is two dict
+hits and an array read. Road distances from a local CSV
+(settings.ROAD_DISTANCES_PATH, columns from_id,to_id,distance_km) override
+the great-circle values for the pairs they list. The matrix is rebuilt on
+first use after a Destination change.
+"""
+import csv
+import logging
+import threading
+from array import array
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+
+from tourism.spatial import haversine_km
+
+logger = logging.getLogger(__name__)
+
+
+class DistanceMatrix:
+    def __init__(self, road_distances_path=None):
+        self.road_distances_path = road_distances_path
+        # (destination id -> row/column, array('f') of size n * n)
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        from tourism.models import Destination  # Import inside to avoid circular import issues
+
+        rows = list(Destination.objects.order_by('id').values_list('id', 'latitude', 'longitude'))
+        positions = {pk: index for index, (pk, _, _) in enumerate(rows)}
+        size = len(rows)
+        distances = array('f', bytes(4 * size * size))
+        for i, (_, lat_i, lon_i) in enumerate(rows):
+            for j in range(i + 1, size):
+                _, lat_j, lon_j = rows[j]
+                distance = haversine_km(lat_i, lon_i, lat_j, lon_j)
+                distances[i * size + j] = distances[j * size + i] = distance
+
+        path = Path(self.road_distances_path) if self.road_distances_path else None
+        if path and path.exists():
+            overridden = 0
+            with open(path, newline='', encoding='utf-8') as handle:
+                for row in csv.DictReader(handle):
+                    i = positions.get(int(row['from_id']))
+                    j = positions.get(int(row['to_id']))
+                    if i is None or j is None:
+                        continue
+                    distances[i * size + j] = distances[j * size + i] = float(row['distance_km'])
+                    overridden += 1
+            logger.info("Loaded %d road distances from %s.", overridden, path)
+        return positions, distances
+
+    def _get(self):
+        current = self._matrix
+        if current is None:
+            with self._lock:
+                if self._matrix is None:
+                    self._matrix = self._build()
+                current = self._matrix
+        return current
+
+    def reset(self):
+        with self._lock:
+            self._matrix = None
+
+    def distance(self, from_id, to_id):
+        """Distance in km between two destinations, or None if one of them is unknown."""
+        positions, distances = self._get()
+        i, j = positions.get(from_id), positions.get(to_id)
+        if i is None or j is None:
+            return None
+        return distances[i * len(positions) + j]
+
+    def route_length(self, destination_ids):
+        """Total km along a sequence of destinations."""
+        return sum(self.distance(a, b) or 0.0 for a, b in zip(destination_ids, destination_ids[1:]))
+
+
+matrix = DistanceMatrix(getattr(settings, 'ROAD_DISTANCES_PATH', None))
+
+
+def fill_distances(departure_id, schedules):
+    """
+    Set the missing distance_km of schedule dicts (destination, day, order)
+    to the distance from the previous stop, starting from the departure city.
+    Stops staying in the same destination are left as they are.
+    """
+    previous = departure_id
+    for schedule in sorted(schedules, key=lambda schedule: (schedule['day'], schedule['order'])):
+        destination = schedule['destination']
+        destination_id = getattr(destination, 'pk', destination)
+        if destination_id != previous and schedule.get('distance_km') is None:
+            distance = matrix.distance(previous, destination_id)
+            if distance is not None:
+                schedule['distance_km'] = Decimal('%.2f' % distance)
+        previous = destination_id
+    return schedules
@@ -0,0 +1,342 @@
+"""
+Circuit generation from a user Preference.
+
+The catalog is reduced once to compact candidate pools (id, destination,
+price, rating attribute) grouped by destination, cached until the catalog
+changes. A plan then only filters those pools in memory:
+
+1. the stop destinations are the ones offering a matching accommodation and
+   things to do, picked by attractiveness over the detour they add between
+   the departure and arrival cities;
+2. the route departure -> stops -> arrival is built nearest neighbour first
+   and improved with 2-opt, endpoints fixed;
+3. the stops are spread over the days of the trip, each day getting its
+   activities, a restaurant and the night's accommodation within the budget.
+
+Distances are read from the destination distance matrix (itinerary.distances).
+The circuit and its schedules are written in one transaction with a single
+bulk insert of the schedules.
+"""
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+
+from tourism import caching, search
+from tourism.models import Activity, ArchaeologicalSite, Destination, GuestHouse, Hotel, Museum, Restaurant
+
+from . import distances
+from .models import Circuit, CircuitSchedule
+
+MAX_DAYS = 30  # Circuit.duration cap
+ACTIVITIES_PER_DAY = 2
+# Shares of the budget given to the nights and to the meals
+ACCOMMODATION_SHARE = 0.5
+MEALS_SHARE = 0.25
+POOL_CACHE_TIMEOUT = 60 * 60
+
+HOTEL = 'hôtel'
+GUEST_HOUSE = "maison d'hôte"
+# Guest houses have a category instead of stars
+GUEST_HOUSE_CATEGORIES = ['Basique', 'Standard', 'Premium', 'Luxe']
+GUEST_HOUSE_CATEGORY_BY_STARS = {1: 'Basique', 2: 'Basique', 3: 'Standard', 4: 'Premium', 5: 'Luxe'}
+
+# Things to do, by CircuitSchedule field
+SIGHT_TYPES = ('activity', 'museum', 'archaeological_site')
+
+
+class PlanningError(Exception):
+    pass
+
+
+def _price(value):
+    return float(value) if value is not None else 0.0
+
+
+def _load_pools():
+    located = {'destination__isnull': False}
+    return {
+        'hotel': [
+            (pk, destination_id, _price(price), stars)
+            for pk, destination_id, price, stars in
+            Hotel.objects.filter(**located).values_list('id', 'destination_id', 'price', 'stars')
+        ],
+        'guest_house': [
+            (pk, destination_id, _price(price), GUEST_HOUSE_CATEGORIES.index(category) + 1
+             if category in GUEST_HOUSE_CATEGORIES else None)
+            for pk, destination_id, price, category in
+            GuestHouse.objects.filter(**located).values_list('id', 'destination_id', 'price', 'category')
+        ],
+        'restaurant': [
+            (pk, destination_id, _price(price), (forks, cuisine_id))
+            for pk, destination_id, price, forks, cuisine_id in
+            Restaurant.objects.filter(**located).values_list('id', 'destination_id', 'price', 'forks', 'cuisine_id')
+        ],
+        'activity': [
+            (pk, destination_id, _price(price), None)
+            for pk, destination_id, price in
+            Activity.objects.filter(**located).values_list('id', 'destination_id', 'price')
+        ],
+        'museum': [
+            (pk, destination_id, _price(price), None)
+            for pk, destination_id, price in
+            Museum.objects.filter(**located).values_list('id', 'destination_id', 'price')
+        ],
+        'archaeological_site': [
+            (pk, destination_id, 0.0, None)
+            for pk, destination_id in
+            ArchaeologicalSite.objects.filter(**located).values_list('id', 'destination_id')
+        ],
+        'destination': {
+            pk: name for pk, name in Destination.objects.values_list('id', 'name')
+        },
+    }
+
+
+# Models whose rows make the candidate pools
+POOL_MODELS = (Destination, Hotel, GuestHouse, Restaurant, Activity, Museum, ArchaeologicalSite)
+
+
+def candidate_pools():
+    """Compact catalog rows by type, cached until the next change of the pool models (shared generations)."""
+    key = 'itinerary:candidate_pools:%s' % '-'.join(caching.generations(POOL_MODELS))
+    pools = cache.get(key)
+    if pools is None:
+        pools = _load_pools()
+        cache.set(key, pools, POOL_CACHE_TIMEOUT)
+    return pools
+
+
+def _by_destination(rows):
+    grouped = defaultdict(list)
+    for row in sorted(rows, key=lambda row: row[2]):  # Cheapest first
+        grouped[row[1]].append(row)
+    return grouped
+
+
+class Planner:
+    def __init__(self, preference, pools=None):
+        self.preference = preference
+        self.pools = pools if pools is not None else candidate_pools()
+        self.destinations = self.pools['destination']
+
+        if preference.departure_city_id is None or preference.arrival_city_id is None:
+            raise PlanningError("The preference needs a departure and an arrival city.")
+        if preference.departure_city_id == preference.arrival_city_id:
+            raise PlanningError("La ville de départ et d'arrivée doivent être différentes.")
+        days = (preference.arrival_date - preference.departure_date).days
+        if days < 1:
+            raise PlanningError("The arrival date must be after the departure date.")
+        self.days = min(days, MAX_DAYS)
+        self.nights = self.days - 1
+        self.budget = float(preference.budget)
+
+    def distance(self, a, b):
+        return distances.matrix.distance(a, b) or 0.0
+
+    # Candidates
+
+    def accommodations(self):
+        preference = self.preference
+        night_cap = self.budget * ACCOMMODATION_SHARE / max(self.nights, 1)
+        if preference.accommodation == GUEST_HOUSE:
+            field, rows = 'guest_house', self.pools['guest_house']
+            minimum = GUEST_HOUSE_CATEGORIES.index(GUEST_HOUSE_CATEGORY_BY_STARS.get(preference.stars, 'Basique')) + 1
+        else:
+            field, rows = 'hotel', self.pools['hotel']
+            minimum = preference.stars
+        rows = [row for row in rows if row[3] is not None and row[3] >= minimum and row[2] <= night_cap]
+        return field, _by_destination(rows)
+
+    def restaurants(self):
+        cuisines = set(self.preference.cuisines.values_list('cuisine_id', flat=True))
+        meal_cap = self.budget * MEALS_SHARE / self.days
+        rows = [
+            row for row in self.pools['restaurant']
+            if row[3][0] >= self.preference.forks and row[2] <= meal_cap
+            and (not cuisines or row[3][1] in cuisines)
+        ]
+        return _by_destination(rows)
+
+    def sights(self):
+        """{field: {destination: rows}} of the things to do; activities follow the preferred categories."""
+        activities = self.pools['activity']
+        categories = list(self.preference.activities.values_list('activity_category__name', flat=True))
+        if categories:
+            # Activities have no category column: match the category names through the search index
+            matched = {
+                entity_id for name in categories for _, entity_id, _ in search.rank(name, ['activity'])
+            }
+            if matched:
+                activities = [row for row in activities if row[0] in matched]
+        return {
+            'activity': _by_destination(activities),
+            'museum': _by_destination(self.pools['museum']),
+            'archaeological_site': _by_destination(self.pools['archaeological_site']),
+        }
+
+    # Route
+
+    def choose_stops(self, candidates, count):
+        """Most attractive destinations for the detour they add between departure and arrival."""
+        departure, arrival = self.preference.departure_city_id, self.preference.arrival_city_id
+        direct = self.distance(departure, arrival)
+
+        def cost(destination):
+            attractiveness, _ = candidates[destination]
+            detour = self.distance(departure, destination) + self.distance(destination, arrival) - direct
+            return detour / attractiveness
+
+        return sorted(candidates, key=cost)[:count]
+
+    def order_route(self, stops):
+        """departure -> stops -> arrival, nearest neighbour then 2-opt with fixed endpoints."""
+        departure, arrival = self.preference.departure_city_id, self.preference.arrival_city_id
+        route, remaining = [departure], set(stops)
+        while remaining:
+            nearest = min(remaining, key=lambda stop: self.distance(route[-1], stop))
+            route.append(nearest)
+            remaining.remove(nearest)
+        route.append(arrival)
+
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, len(route) - 2):
+                for j in range(i + 1, len(route) - 1):
+                    before = self.distance(route[i - 1], route[i]) + self.distance(route[j], route[j + 1])
+                    after = self.distance(route[i - 1], route[j]) + self.distance(route[i], route[j + 1])
+                    if after < before - 1e-9:
+                        route[i:j + 1] = reversed(route[i:j + 1])
+                        improved = True
+        return route
+
+    # Plan
+
+    def plan(self):
+        """Return (circuit fields, [schedule fields]) without writing anything."""
+        accommodation_field, accommodations = self.accommodations()
+        restaurants = self.restaurants()
+        sights = self.sights()
+
+        departure, arrival = self.preference.departure_city_id, self.preference.arrival_city_id
+        candidates = {}
+        for destination in self.destinations:
+            if destination in (departure, arrival):
+                continue
+            things = sum(len(sights[field].get(destination, ())) for field in SIGHT_TYPES)
+            if things and (accommodations.get(destination) or not self.nights):
+                attractiveness = min(things, ACTIVITIES_PER_DAY * 2) + (1 if restaurants.get(destination) else 0)
+                candidates[destination] = (attractiveness, things)
+
+        stops = self.choose_stops(candidates, max(self.days - 2, 0))
+        route = self.order_route(stops)
+
+        # Spread the route over the days: first place on day 1, last on the last day
+        last = len(route) - 1
+        arrival_day = [1 + round(i * (self.days - 1) / last) for i in range(len(route))]
+
+        used = set()
+        spent = 0.0
+        schedules = []
+        position = 0
+        base = route[0]
+        day = order = 0
+
+        def add(destination, distance_km=None, **entity):
+            nonlocal order
+            order += 1
+            schedules.append({
+                'destination_id': destination, 'day': day, 'order': order,
+                'distance_km': Decimal('%.2f' % distance_km) if distance_km is not None else None,
+                **entity,
+            })
+
+        for day in range(1, self.days + 1):
+            order = 0
+            arrivals = []
+            while position < len(route) and arrival_day[position] == day:
+                arrivals.append(position)
+                position += 1
+
+            for index in arrivals:
+                place = route[index]
+                distance_km = self.distance(route[index - 1], place) if index else None
+                if index == arrivals[-1]:
+                    # The last place reached today is where the day is spent
+                    base = place
+                    add(place, distance_km)
+                else:
+                    # Passed through on the way: one sight if there is one
+                    sight = self._pick(sights, place, used, self.budget - spent, limit=1)
+                    spent += sum(price for _, _, price in sight)
+                    entity = {f'{field}_id': pk for field, pk, _ in sight}
+                    add(place, distance_km, **entity)
+
+            for field, pk, price in self._pick(sights, base, used, self.budget - spent, ACTIVITIES_PER_DAY):
+                spent += price
+                add(base, **{f'{field}_id': pk})
+
+            restaurant = self._cheapest(restaurants.get(base), used, 'restaurant', self.budget - spent, reuse=True)
+            if restaurant:
+                spent += restaurant[2]
+                add(base, restaurant_id=restaurant[0])
+
+            if day < self.days:
+                stay = self._cheapest(accommodations.get(base), used, accommodation_field, self.budget - spent, reuse=True)
+                if stay:
+                    spent += stay[2]
+                    add(base, **{f'{accommodation_field}_id': stay[0]})
+
+        code = 'GEN' + uuid.uuid4().hex[:8].upper()
+        circuit = {
+            'name': f"Circuit {self.preference.pk} {code}",
+            'circuit_code': code,
+            'departure_city_id': departure,
+            'arrival_city_id': arrival,
+            'price': Decimal('%.2f' % spent),
+            'duration': self.days,
+            'description': ' - '.join(self.destinations[place] for place in route),
+        }
+        return circuit, schedules
+
+    def _cheapest(self, rows, used, field, remaining, reuse=False):
+        """Cheapest row not used yet (or already used, when reuse is allowed) that fits the remaining budget."""
+        for row in rows or ():
+            if row[2] > remaining:
+                break
+            if reuse or (field, row[0]) not in used:
+                used.add((field, row[0]))
+                return row
+        return None
+
+    def _pick(self, sights, destination, used, remaining, limit):
+        """Up to `limit` unused things to do at the destination, alternating between types."""
+        picked = []
+        while len(picked) < limit:
+            found = False
+            for field in SIGHT_TYPES:
+                if len(picked) == limit:
+                    break
+                row = self._cheapest(sights[field].get(destination), used, field, remaining)
+                if row:
+                    picked.append((field, row[0], row[2]))
+                    remaining -= row[2]
+                    found = True
+            if not found:
+                break
+        return picked
+
+
+def generate_circuit(preference):
+    """Plan a circuit for the preference and save it with its schedules."""
+    circuit_fields, schedule_fields = Planner(preference).plan()
+    with transaction.atomic():
+        circuit = Circuit.objects.create(**circuit_fields)
+        CircuitSchedule.objects.bulk_create([
+            CircuitSchedule(circuit=circuit, **fields) for fields in schedule_fields
+        ])
+        caching.bump(CircuitSchedule)  # bulk_create sends no post_save
+    return circuit
@@ -1,34 +1,274 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Prefetch, Q
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+from tourism import caching
+from tourism.serializers import CatalogCardSerializer
 from .models import Circuit, CircuitSchedule
 from .models import CircuitHistory
+from .distances import fill_distances
+
+
+
+def _coerce_pk(model, value):
+    """The value as a primary key of the model, or None when it cannot be one."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return model._meta.pk.to_python(value)
+    except (DjangoValidationError, TypeError, ValueError):
+        return None
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField reading the rows a list serializer loaded in bulk
+    (context['related_rows'], {model: {pk: row}}) instead of one query per value.
+    """
 
+    def to_internal_value(self, data):
+        queryset = self.get_queryset()
+        rows = self.context.get('related_rows', {}).get(queryset.model)
+        if rows is None:
+            return super().to_internal_value(data)
+        pk = _coerce_pk(queryset.model, data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in rows:
+            self.fail('does_not_exist', pk_value=data)
+        return rows[pk]
+
+
+class PrefetchedUniqueValidator(UniqueValidator):
+    """UniqueValidator answered from the values a list serializer found taken in one query (context['taken_values'])."""
+
+    def __call__(self, value, serializer_field):
+        taken = serializer_field.context.get('taken_values', {}).get(serializer_field.source_attrs[-1])
+        if taken is None:
+            return super().__call__(value, serializer_field)
+        if value in taken:
+            raise serializers.ValidationError(self.message, code='unique')
+
+
+def _collect_related_ids(serializer, items, ids):
+    """Add the ids given in `items` to the related fields of `serializer` (nested lists included) to ids[model]."""
+    for name, field in serializer.fields.items():
+        if isinstance(field, serializers.ListSerializer):
+            nested = [
+                row for item in items if isinstance(item.get(name), list)
+                for row in item[name] if isinstance(row, dict)
+            ]
+            _collect_related_ids(field.child, nested, ids)
+        elif isinstance(field, PrefetchedPrimaryKeyRelatedField):
+            model = field.queryset.model
+            pks = ids[model]  # Every related model gets its rows, even when none is referenced
+            for item in items:
+                pk = _coerce_pk(model, item.get(name))
+                if pk is not None:
+                    pks.add(pk)
 
 
 class CircuitScheduleSerializer(serializers.ModelSerializer):
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+
     class Meta:
         model = CircuitSchedule
         exclude = ['circuit']  # Don't include 'circuit' in the request payload
 
 
 
+def save_circuits(items):
+    """
+    Insert circuits with their schedules (validated data, schedules nested)
+    in one transaction: one insert for the circuits, one for all the schedules.
+    """
+    schedules_by_circuit = [item.pop('schedules', []) for item in items]
+    with transaction.atomic():
+        circuits = Circuit.objects.bulk_create([Circuit(**item) for item in items])
+        CircuitSchedule.objects.bulk_create([
+            CircuitSchedule(circuit=circuit, **schedule)
+            for circuit, schedules in zip(circuits, schedules_by_circuit)
+            # distance_km left empty is taken from the destination distance matrix
+            for schedule in fill_distances(circuit.departure_city_id, schedules)
+        ])
+        # bulk_create sends no post_save
+        caching.bump(Circuit)
+        caching.bump(CircuitSchedule)
+    return circuits
+
+
+class CircuitListSerializer(serializers.ListSerializer):
+    """
+    Batch of circuits, saved together by save_circuits(). The destinations and
+    catalog rows referenced by the batch are loaded with one query per model and
+    the unique fields checked with one query, before the items are validated.
+    """
+    unique_fields = ('name', 'circuit_code')
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            items = [item for item in data if isinstance(item, dict)]
+            self.load_related_rows(items)
+            self.load_taken_values(items)
+        return super().to_internal_value(data)
+
+    def load_related_rows(self, items):
+        ids = defaultdict(set)
+        _collect_related_ids(self.child, items, ids)
+        self.context['related_rows'] = {model: model.objects.in_bulk(pks) for model, pks in ids.items()}
+
+    def load_taken_values(self, items):
+        values = {
+            field: {item[field] for item in items if isinstance(item.get(field), str)}
+            for field in self.unique_fields
+        }
+        taken = {field: set() for field in self.unique_fields}
+        conditions = Q()
+        for field, field_values in values.items():
+            if field_values:
+                conditions |= Q(**{f'{field}__in': field_values})
+        if conditions:
+            for row in Circuit.objects.filter(conditions).values(*self.unique_fields):
+                for field in self.unique_fields:
+                    if row[field] in values[field]:
+                        taken[field].add(row[field])
+        self.context['taken_values'] = taken
+
+    def validate(self, data):
+        for field in ('name', 'circuit_code'):
+            seen = set()
+            for item in data:
+                if item[field] in seen:
+                    raise serializers.ValidationError(f"Duplicate {field} in the batch: {item[field]}")
+                seen.add(item[field])
+        return data
+
+    def create(self, validated_data):
+        return save_circuits(validated_data)
+
+
 class CircuitCreateSerializer(serializers.ModelSerializer):
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
     schedules = CircuitScheduleSerializer(many=True, required=False)
 
     class Meta:
         model = Circuit
         fields = '__all__'  # Or explicitly: ['name', 'circuit_code', 'departure_city', 'arrival_city', 'price', 'duration', 'description', 'schedules']
+        list_serializer_class = CircuitListSerializer
+
+    def build_standard_field(self, field_name, model_field):
+        field_class, field_kwargs = super().build_standard_field(field_name, model_field)
+        # Lets a batch check name / circuit_code uniqueness with one query
+        field_kwargs['validators'] = [
+            PrefetchedUniqueValidator(queryset=validator.queryset, message=validator.message, lookup=validator.lookup)
+            if type(validator) is UniqueValidator else validator
+            for validator in field_kwargs.get('validators', [])
+        ]
+        return field_class, field_kwargs
 
     def validate(self, data):
         if data['departure_city'] == data['arrival_city']:
             raise serializers.ValidationError("La ville de départ et d'arrivée doivent être différentes.")
+
+        # Checked here rather than in CircuitSchedule.clean(), before anything is written
+        duration = data.get('duration', getattr(self.instance, 'duration', None))
+        errors = []
+        seen = set()
+        for index, schedule in enumerate(data.get('schedules', []), start=1):
+            day, order = schedule['day'], schedule['order']
+            if duration is not None and day > duration:
+                errors.append(f"Étape {index} : le jour ({day}) dépasse la durée du circuit ({duration}).")
+            if (day, order) in seen:
+                errors.append(f"Étape {index} : le jour {day} a déjà une étape d'ordre {order}.")
+            seen.add((day, order))
+        if errors:
+            raise serializers.ValidationError({'schedules': errors})
         return data
 
     def create(self, validated_data):
-        schedules_data = validated_data.pop('schedules', [])
-        circuit = Circuit.objects.create(**validated_data)
-        for schedule in schedules_data:
-            CircuitSchedule.objects.create(circuit=circuit, **schedule)
-        return circuit
+        return save_circuits([validated_data])[0]
+
+
+
+# Optional catalog relations of a schedule, named like the catalog entity types
+SCHEDULE_ENTITY_FIELDS = ('activity', 'festival', 'museum', 'hotel', 'guest_house', 'restaurant', 'archaeological_site')
+
+
+def circuit_detail_queryset(queryset):
+    """
+    Load circuits with their schedules and everything the detail serializer
+    renders in two queries: the circuits, then all their schedules joined to
+    the destination and the catalog rows (with their own destination).
+    """
+    schedules = CircuitSchedule.objects.select_related(
+        'destination',
+        *SCHEDULE_ENTITY_FIELDS,
+        *[f'{field}__destination' for field in SCHEDULE_ENTITY_FIELDS],
+    ).order_by('day', 'order')
+    return queryset.select_related('departure_city', 'arrival_city').prefetch_related(
+        Prefetch('schedules', queryset=schedules)
+    )
+
+
+def _destination(destination):
+    return {'id': destination.id, 'name': destination.name} if destination else None
+
+
+class CircuitScheduleDetailSerializer(serializers.ModelSerializer):
+    destination = serializers.SerializerMethodField()
+    entities = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CircuitSchedule
+        fields = ['id', 'day', 'order', 'distance_km', 'destination', 'entities']
+
+    def get_destination(self, obj):
+        return _destination(obj.destination)
+
+    def get_entities(self, obj):
+        entities = []
+        for field in SCHEDULE_ENTITY_FIELDS:
+            entity = getattr(obj, field)
+            if entity is not None:
+                entities.append({'entity_type': field, **CatalogCardSerializer(entity).data})
+        return entities
+
+
+class CircuitDetailSerializer(serializers.ModelSerializer):
+    """
+    Read model of a circuit with its day-by-day itinerary.
+    Expects the queryset of circuit_detail_queryset().
+    """
+    departure_city = serializers.SerializerMethodField()
+    arrival_city = serializers.SerializerMethodField()
+    itinerary = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Circuit
+        fields = ['id', 'name', 'circuit_code', 'departure_city', 'arrival_city', 'price', 'duration',
+                  'description', 'itinerary']
+
+    def get_departure_city(self, obj):
+        return _destination(obj.departure_city)
+
+    def get_arrival_city(self, obj):
+        return _destination(obj.arrival_city)
+
+    def get_itinerary(self, obj):
+        days = {}
+        for schedule in obj.schedules.all():  # Prefetched, ordered by day and order
+            days.setdefault(schedule.day, []).append(CircuitScheduleDetailSerializer(schedule).data)
+        return [
+            {
+                'day': day,
+                'distance_km': round(sum(float(stop['distance_km']) for stop in stops if stop['distance_km']), 2),
+                'stops': stops,
+            }
+            for day, stops in days.items()
+        ]
 
 
 
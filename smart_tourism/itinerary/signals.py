@@ -0,0 +1,70 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from tourism import caching
+from tourism.models import CATALOG_ENTITY_TYPES, CATALOG_MODELS, Destination
+from . import distances, snapshots
+from .models import Circuit, CircuitSchedule
+
+
+@receiver([post_save, post_delete], sender=Destination)
+def reset_distance_matrix(sender, **kwargs):
+    """The matrix covers every destination, rebuild it after a change."""
+    distances.matrix.reset()
+
+
+@receiver(pre_delete, sender=Destination)
+def collect_destination_snapshots(sender, instance, **kwargs):
+    """The circuits are looked up before the delete cascades through them."""
+    instance._snapshot_circuits = snapshots.circuits_using_destination(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Destination)
+def invalidate_destination_snapshots(sender, instance, **kwargs):
+    circuit_ids = instance.__dict__.pop('_snapshot_circuits', None)
+    if circuit_ids is None:
+        circuit_ids = snapshots.circuits_using_destination(instance.pk)
+    snapshots.invalidate(circuit_ids)
+
+
+@receiver([post_save, post_delete], sender=Circuit)
+def invalidate_circuit_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Circuit)
+@receiver([post_save, post_delete], sender=CircuitSchedule)
+def bump_circuit_generation(sender, **kwargs):
+    """Circuits have no updated_at: their ETags (tourism.etags) follow these counters."""
+    caching.bump(sender)
+
+
+@receiver([post_save, post_delete], sender=CircuitSchedule)
+def invalidate_schedule_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate([instance.circuit_id])
+
+
+# CircuitSchedule foreign keys are named like the catalog entity types
+ENTITY_FIELDS = CATALOG_ENTITY_TYPES
+
+
+def collect_catalog_snapshots(sender, instance, **kwargs):
+    """
+    The schedules' catalog foreign keys are SET_NULL: the delete clears them
+    before post_delete, so the circuits using the row are collected here.
+    """
+    instance._snapshot_circuits = list(snapshots.circuits_using(ENTITY_FIELDS[sender], instance.pk))
+
+
+def invalidate_catalog_snapshots(sender, instance, **kwargs):
+    """Only the circuits with a schedule referencing the saved or deleted row are dropped."""
+    circuit_ids = instance.__dict__.pop('_snapshot_circuits', None)
+    if circuit_ids is None:
+        circuit_ids = snapshots.circuits_using(ENTITY_FIELDS[sender], instance.pk)
+    snapshots.invalidate(circuit_ids)
+
+
+for model in CATALOG_MODELS.values():
+    pre_delete.connect(collect_catalog_snapshots, sender=model, dispatch_uid=f'circuit_snapshots_collect_{model.__name__}')
+    post_save.connect(invalidate_catalog_snapshots, sender=model, dispatch_uid=f'circuit_snapshots_{model.__name__}')
+    post_delete.connect(invalidate_catalog_snapshots, sender=model, dispatch_uid=f'circuit_snapshots_delete_{model.__name__}')
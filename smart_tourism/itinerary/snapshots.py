@@ -0,0 +1,73 @@
+"""
+Cached itinerary snapshots.
+
+The expanded JSON of a circuit (CircuitDetailSerializer) is cached per
+circuit. A snapshot is dropped when the circuit or one of its schedules
+changes, and when a catalog row or destination it references is saved or
+deleted: the schedules' foreign keys give the circuits using that row, so
+only those are invalidated.
+
+That invalidation only reaches the cache of the process handling the change.
+The keys also carry the shared generation counters (tourism.caching) of every
+model a snapshot shows, so once the change commits, the snapshots cached by the
+other workers stop being addressed too, as their catalog responses and ETags do.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from tourism import caching
+from tourism.models import CATALOG_MODELS, Destination
+
+from .models import Circuit, CircuitSchedule
+
+SNAPSHOT_TIMEOUT = 24 * 60 * 60  # Invalidation keeps them fresh, this only bounds memory
+
+# Models whose rows show in a snapshot
+SNAPSHOT_MODELS = (Circuit, CircuitSchedule, Destination, *CATALOG_MODELS.values())
+
+
+def generation():
+    """
+    Shared generation of the snapshot models. Read it before loading the
+    circuits: a change committed meanwhile then caches under a retired key.
+    """
+    return hashlib.md5(str(caching.generations(SNAPSHOT_MODELS)).encode('utf-8')).hexdigest()
+
+
+def key(circuit_id, generation):
+    return 'itinerary:circuit:%s:%s' % (generation, circuit_id)
+
+
+def get_many(circuit_ids, generation):
+    """Return {circuit id: snapshot} of the cached ones."""
+    keys = {circuit_id: key(circuit_id, generation) for circuit_id in circuit_ids}
+    cached = cache.get_many(list(keys.values()))
+    return {circuit_id: cached[keys[circuit_id]] for circuit_id in circuit_ids if keys[circuit_id] in cached}
+
+
+def set_many(snapshots, generation):
+    cache.set_many({key(circuit_id, generation): data for circuit_id, data in snapshots.items()}, SNAPSHOT_TIMEOUT)
+
+
+def invalidate(circuit_ids):
+    circuit_ids = list(circuit_ids)
+    if circuit_ids:
+        current = generation()
+        cache.delete_many([key(circuit_id, current) for circuit_id in circuit_ids])
+
+
+def circuits_using(field, pk):
+    """Ids of the circuits with a schedule pointing at the row through `field`."""
+    return CircuitSchedule.objects.filter(**{field: pk}).values_list('circuit_id', flat=True).distinct()
+
+
+def circuits_using_destination(destination_id):
+    # Circuits start and end at destinations too
+    ids = set(circuits_using('destination', destination_id))
+    ids.update(
+        Circuit.objects.filter(Q(departure_city=destination_id) | Q(arrival_city=destination_id))
+        .values_list('id', flat=True)
+    )
+    return ids
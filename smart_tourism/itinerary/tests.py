@@ -1,3 +1,318 @@
-from django.test import TestCase
+import math
+from datetime import date, timedelta
+from decimal import Decimal
+from random import Random
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+
+from tourism import caching
+from tourism.models import Destination, Hotel, Restaurant
+from tourism.tests import CATALOG_TABLES, CatalogTestCase, ListQueryCountMixin
+from users.models import CustomUser
+
+from . import snapshots
+from .models import Circuit, CircuitSchedule
+from .planner import ACCOMMODATION_SHARE, GUEST_HOUSE, HOTEL, MEALS_SHARE, SIGHT_TYPES, Planner, candidate_pools
 
 # Create your tests here.
+
+
+class CircuitSnapshotTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        tunis = Destination.objects.create(name='Tunis', latitude=36.8065, longitude=10.1815)
+        sousse = Destination.objects.create(name='Sousse', latitude=35.8256, longitude=10.6084)
+        self.hotel = Hotel.objects.create(name='Hotel Marhaba', stars=4, price=120, destination=sousse)
+        self.circuit = Circuit.objects.create(
+            name='Sahel', circuit_code='SAHEL1', departure_city=tunis, arrival_city=sousse, price=300, duration=2,
+        )
+        CircuitSchedule.objects.create(circuit=self.circuit, destination=sousse, day=1, order=1, hotel=self.hotel)
+        self.url = f'/api/itinerary/circuits/{self.circuit.pk}/'
+
+    def scheduled_entities(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            (entity['entity_type'], entity['id'])
+            for day in response.json()['itinerary'] for stop in day['stops'] for entity in stop['entities']
+        ]
+
+    def test_deleting_a_scheduled_hotel_rebuilds_the_snapshot(self):
+        self.assertEqual(self.scheduled_entities(), [('hotel', self.hotel.pk)])
+        self.assertIn(self.circuit.pk, snapshots.get_many([self.circuit.pk], snapshots.generation()))
+
+        self.hotel.delete()
+
+        self.assertEqual(snapshots.get_many([self.circuit.pk], snapshots.generation()), {})
+        self.assertEqual(self.scheduled_entities(), [])
+
+    def test_a_shared_generation_bump_retires_the_snapshot(self):
+        self.scheduled_entities()
+        generation = snapshots.generation()
+        self.assertIn(self.circuit.pk, snapshots.get_many([self.circuit.pk], generation))
+
+        # A change handled by another worker: no signal here, only its bump of the shared counters
+        Hotel.objects.filter(pk=self.hotel.pk).update(name='Hotel Riadh')
+        with self.captureOnCommitCallbacks(execute=True):
+            caching.bump(Hotel)
+
+        self.assertNotEqual(snapshots.generation(), generation)
+        response = self.client.get(self.url)
+        names = [
+            entity['name'] for day in response.json()['itinerary'] for stop in day['stops'] for entity in stop['entities']
+        ]
+        self.assertEqual(names, ['Hotel Riadh'])
+
+
+class CircuitListQueryTests(ListQueryCountMixin, CatalogTestCase):
+    def test_circuit_list(self):
+        tunis = Destination.objects.create(name='Tunis', latitude=36.8065, longitude=10.1815)
+        sousse = Destination.objects.create(name='Sousse', latitude=35.8256, longitude=10.6084)
+        hotel = Hotel.objects.create(name='Hotel Marhaba', stars=4, price=120, destination=sousse)
+        restaurant = Restaurant.objects.create(name='Le Bon Vivant', forks=2, price=30, destination=sousse)
+
+        def add_circuits(count):
+            for _ in range(count):
+                number = Circuit.objects.count() + 1
+                circuit = Circuit.objects.create(
+                    name=f'Sahel {number}', circuit_code=f'SAHEL{number}', departure_city=tunis,
+                    arrival_city=sousse, price=300, duration=2,
+                )
+                CircuitSchedule.objects.bulk_create([
+                    CircuitSchedule(circuit=circuit, destination=sousse, day=1, order=1, hotel=hotel),
+                    CircuitSchedule(circuit=circuit, destination=sousse, day=2, order=1, restaurant=restaurant),
+                ])
+
+        self.assertConstantListQueries('/api/itinerary/circuits/', add_circuits)
+
+
+class CircuitBatchTests(CatalogTestCase):
+    unmanaged_models = (*CATALOG_TABLES, CustomUser)
+    url = '/api/itinerary/circuits/batch/'
+
+    def setUp(self):
+        super().setUp()
+        self.tunis = Destination.objects.create(name='Tunis', latitude=36.8065, longitude=10.1815)
+        self.sousse = Destination.objects.create(name='Sousse', latitude=35.8256, longitude=10.6084)
+        self.hotel = Hotel.objects.create(name='Hotel Marhaba', stars=4, price=120, destination=self.sousse)
+        admin = CustomUser.objects.create_user('admin@example.com', 'Amira', 'Ben Salah', 'secret', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def circuit(self, number, **fields):
+        return {
+            'name': f'Sahel {number}', 'circuit_code': f'SAHEL{number}',
+            'departure_city': self.tunis.pk, 'arrival_city': self.sousse.pk, 'price': '300.00', 'duration': 2,
+            'schedules': [
+                {'destination': self.sousse.pk, 'day': 1, 'order': 1, 'hotel': self.hotel.pk},
+                {'destination': self.sousse.pk, 'day': 2, 'order': 1},
+            ],
+            **fields,
+        }
+
+    def post(self, circuits):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, circuits, format='json')
+
+    def assertRejected(self, circuits, message):
+        response = self.post(circuits)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(message, str(response.json()))
+        self.assertFalse(Circuit.objects.exists())
+        self.assertFalse(CircuitSchedule.objects.exists())
+
+    def test_batch_is_saved_with_its_schedules(self):
+        response = self.post([self.circuit(1), self.circuit(2)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(Circuit.objects.count(), 2)
+        self.assertEqual(CircuitSchedule.objects.filter(hotel=self.hotel).count(), 2)
+
+    def test_duplicate_name_in_the_batch(self):
+        self.assertRejected([self.circuit(1), self.circuit(2, name='Sahel 1')], 'Duplicate name in the batch: Sahel 1')
+
+    def test_duplicate_code_in_the_batch(self):
+        self.assertRejected([self.circuit(1), self.circuit(2, circuit_code='SAHEL1')], 'Duplicate circuit_code')
+
+    def test_code_already_taken(self):
+        Circuit.objects.create(
+            name='Cap Bon', circuit_code='SAHEL2', departure_city=self.tunis, arrival_city=self.sousse,
+            price=200, duration=1,
+        )
+        response = self.post([self.circuit(1), self.circuit(2)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn('circuit_code', response.json()[1])
+        self.assertEqual(Circuit.objects.count(), 1)
+
+    def test_unknown_destination(self):
+        circuit = self.circuit(1)
+        circuit['schedules'][1]['destination'] = 999
+        self.assertRejected([circuit], 'Invalid pk "999"')
+
+    def test_same_departure_and_arrival(self):
+        self.assertRejected([self.circuit(1, arrival_city=self.tunis.pk)], "La ville de départ et d'arrivée")
+
+    def test_day_beyond_the_duration(self):
+        self.assertRejected([self.circuit(1, duration=1)], 'le jour (2) dépasse la durée du circuit (1)')
+
+    def test_only_admins_import(self):
+        self.client.force_authenticate(CustomUser.objects.create_user('karim@example.com', 'Karim', 'Trabelsi', 'secret'))
+        self.assertEqual(self.post([self.circuit(1)]).status_code, 403)
+        self.assertFalse(Circuit.objects.exists())
+
+
+class CandidatePoolTests(CatalogTestCase):
+    def test_pools_follow_the_shared_generations(self):
+        sousse = Destination.objects.create(name='Sousse', latitude=35.8256, longitude=10.6084)
+        hotel = Hotel.objects.create(name='Hotel Marhaba', stars=4, price=120, destination=sousse)
+        self.assertEqual(candidate_pools()['hotel'], [(hotel.pk, sousse.pk, 120.0, 4)])
+
+        # A price changed by another worker: no signal here, only its bump of the shared counter
+        Hotel.objects.filter(pk=hotel.pk).update(price=95)
+        self.assertEqual(candidate_pools()['hotel'], [(hotel.pk, sousse.pk, 120.0, 4)])
+        with self.captureOnCommitCallbacks(execute=True):
+            caching.bump(Hotel)
+        self.assertEqual(candidate_pools()['hotel'], [(hotel.pk, sousse.pk, 95.0, 4)])
+
+
+class Related:
+    """Stands for a preference's related manager (cuisines, activities)."""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+
+    def values_list(self, *fields, flat=False):
+        return list(self.values)
+
+
+def make_preference(days=5, budget=2000, accommodation=HOTEL, stars=3, forks=1, departure=1, arrival=6):
+    start = date(2026, 5, 1)
+    return SimpleNamespace(
+        pk=1, departure_city_id=departure, arrival_city_id=arrival,
+        departure_date=start, arrival_date=start + timedelta(days=days),
+        budget=Decimal(budget), accommodation=accommodation, stars=stars, forks=forks,
+        cuisines=Related(), activities=Related(),
+    )
+
+
+# Destinations 1 (departure) to 6 (arrival) along the coast, 4 a little inland
+COORDINATES = {1: (0.0, 0.0), 2: (2.0, 0.5), 3: (4.0, -0.5), 4: (6.0, 2.0), 5: (8.0, 0.0), 6: (10.0, 0.0)}
+
+
+def make_pools():
+    """Candidate pools shaped like planner._load_pools(), one entity of each type per destination."""
+    destinations = list(COORDINATES)
+    return {
+        'hotel': [(100 + d, d, 60.0, 3) for d in destinations],
+        # Guest house category ranks, 1 (Basique) to 4 (Luxe)
+        'guest_house': [(200 + d, d, 30.0 + 10 * (d % 4), d % 4 + 1) for d in destinations],
+        'restaurant': [(300 + d, d, 15.0, (2, 1)) for d in destinations],
+        'activity': [(400 + d, d, 20.0, None) for d in destinations],
+        'museum': [(500 + d, d, 8.0, None) for d in destinations],
+        'archaeological_site': [(600 + d, d, 0.0, None) for d in destinations if d % 2],
+        'destination': {d: f'Destination {d}' for d in destinations},
+    }
+
+
+class PlaneDistancePlanner(Planner):
+    """Straight-line distances between `coordinates` instead of the destination matrix."""
+    coordinates = COORDINATES
+
+    def distance(self, a, b):
+        (xa, ya), (xb, yb) = self.coordinates[a], self.coordinates[b]
+        return math.hypot(xa - xb, ya - yb)
+
+
+class PlannerTests(SimpleTestCase):
+    def plan(self, **preference):
+        pools = make_pools()
+        circuit, schedules = PlaneDistancePlanner(make_preference(**preference), pools).plan()
+        return pools, circuit, schedules
+
+    def picked(self, schedules):
+        """(field, pk) of every entity the schedules book."""
+        return [
+            (key[:-3], value) for schedule in schedules for key, value in schedule.items()
+            if key.endswith('_id') and key != 'destination_id'
+        ]
+
+    def test_stops_spread_over_the_days(self):
+        _, circuit, schedules = self.plan(days=5)
+        self.assertEqual(circuit['duration'], 5)
+        self.assertEqual({schedule['day'] for schedule in schedules}, set(range(1, 6)))
+
+        slots = [(schedule['day'], schedule['order']) for schedule in schedules]
+        self.assertEqual(len(slots), len(set(slots)))
+        for day in range(1, 6):
+            orders = sorted(order for slot_day, order in slots if slot_day == day)
+            self.assertEqual(orders, list(range(1, len(orders) + 1)))
+
+        ordered = sorted(schedules, key=lambda schedule: (schedule['day'], schedule['order']))
+        self.assertEqual(ordered[0]['destination_id'], 1)
+        self.assertIn(6, [schedule['destination_id'] for schedule in ordered if schedule['day'] == 5])
+        # days - 2 stops between the departure and arrival cities
+        self.assertEqual(len({schedule['destination_id'] for schedule in schedules} - {1, 6}), 3)
+
+    def test_budget_caps_the_picks(self):
+        for budget in (150, 400, 2000):
+            with self.subTest(budget=budget):
+                pools, circuit, schedules = self.plan(days=5, budget=budget)
+                prices = {
+                    (field, row[0]): row[2]
+                    for field in ('hotel', 'restaurant', *SIGHT_TYPES) for row in pools[field]
+                }
+                picked = self.picked(schedules)
+                spent = sum(prices[pick] for pick in picked)
+                self.assertLessEqual(spent, budget)
+                self.assertEqual(circuit['price'], Decimal('%.2f' % spent))
+
+                for field, pk in picked:
+                    if field == 'hotel':
+                        self.assertLessEqual(prices[field, pk], budget * ACCOMMODATION_SHARE / 4)
+                    elif field == 'restaurant':
+                        self.assertLessEqual(prices[field, pk], budget * MEALS_SHARE / 5)
+
+    def test_guest_house_category_follows_the_stars(self):
+        pools, _, schedules = self.plan(days=5, accommodation=GUEST_HOUSE, stars=4)
+        picked = self.picked(schedules)
+        self.assertNotIn('hotel', [field for field, _ in picked])
+
+        stays = [pk for field, pk in picked if field == 'guest_house']
+        self.assertTrue(stays)
+        # 4 stars asks for a Premium (rank 3) guest house or better
+        ranks = {row[0]: row[3] for row in pools['guest_house']}
+        self.assertTrue(all(ranks[pk] >= 3 for pk in stays))
+
+    def test_single_day(self):
+        _, circuit, schedules = self.plan(days=1)
+        self.assertEqual(circuit['duration'], 1)
+        self.assertEqual({schedule['day'] for schedule in schedules}, {1})
+        self.assertEqual(schedules[0]['destination_id'], 1)
+        self.assertIn(6, [schedule['destination_id'] for schedule in schedules])
+        # No night to spend
+        self.assertFalse([field for field, _ in self.picked(schedules) if field in ('hotel', 'guest_house')])
+
+    def test_two_opt_never_lengthens_the_nearest_neighbour_route(self):
+        random = Random(7)
+        stops = list(range(2, 10))
+        for _ in range(25):
+            planner = PlaneDistancePlanner(make_preference(departure=1, arrival=10), make_pools())
+            planner.coordinates = {pk: (random.uniform(0, 100), random.uniform(0, 100)) for pk in range(1, 11)}
+
+            nearest_neighbour, remaining = [1], set(stops)
+            while remaining:
+                nearest = min(remaining, key=lambda stop: planner.distance(nearest_neighbour[-1], stop))
+                nearest_neighbour.append(nearest)
+                remaining.remove(nearest)
+            nearest_neighbour.append(10)
+
+            def length(route):
+                return sum(planner.distance(a, b) for a, b in zip(route, route[1:]))
+
+            route = planner.order_route(stops)
+            self.assertEqual((route[0], route[-1]), (1, 10))
+            self.assertEqual(sorted(route[1:-1]), stops)
+            self.assertLessEqual(length(route), length(nearest_neighbour) + 1e-9)
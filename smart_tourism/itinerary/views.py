@@ -2,7 +2,7 @@ from django.shortcuts import render
 
 from rest_framework import viewsets
 from .models import Circuit
-from .serializers import CircuitCreateSerializer
+from .serializers import CircuitCreateSerializer, CircuitDetailSerializer, circuit_detail_queryset
 from users.permissions import CircuitPermission  # import the new one
 from .models import CircuitHistory
 from .serializers import CircuitHistorySerializer
@@ -10,15 +10,108 @@ from rest_framework.permissions import IsAuthenticated
 from datetime import datetime
 from rest_framework.response import Response
 from rest_framework import status
+from tourism.pagination import CatalogPagination
+from rest_framework.decorators import action
+from users.models import Preference
+from .planner import PlanningError, generate_circuit
+from . import snapshots
+from tourism.etags import ConditionalGetMixin
+from tourism.models import CATALOG_MODELS, Destination
+from .models import CircuitSchedule
 
 
 
 
 
-class CircuitViewSet(viewsets.ModelViewSet):
+class CircuitViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Circuit.objects.all()
     serializer_class = CircuitCreateSerializer
+    pagination_class = CatalogPagination
     permission_classes = [CircuitPermission]  # ✅ add it here
+    max_batch_size = 500
+    # The expanded itineraries show the schedules, their destinations and catalog rows
+    etag_dependencies = (CircuitSchedule, Destination, *CATALOG_MODELS.values())
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return CircuitDetailSerializer
+        return CircuitCreateSerializer
+
+    def detail_data(self, circuits):
+        """
+        Expanded itineraries of the circuits, from their cached snapshots;
+        the missing ones are loaded together (circuit_detail_queryset) and cached.
+        """
+        ids = [circuit.pk for circuit in circuits]
+        generation = snapshots.generation()
+        found = snapshots.get_many(ids, generation)
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            loaded = circuit_detail_queryset(Circuit.objects.filter(pk__in=missing))
+            fresh = {circuit.pk: dict(CircuitDetailSerializer(circuit).data) for circuit in loaded}
+            snapshots.set_many(fresh, generation)
+            found.update(fresh)
+        return [found[pk] for pk in ids if pk in found]
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.detail_data(page))
+        return Response(self.detail_data(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        circuit = self.get_object()
+        return Response(self.detail_data([circuit])[0])
+
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """
+        Plan and save a circuit from a Preference: POST {"preference": <id>}
+        Users can only generate from their own preferences.
+        """
+        preference_id = request.data.get('preference')
+        preferences = Preference.objects.all()
+        if request.user.role != 'admin':
+            preferences = preferences.filter(user=request.user)
+        try:
+            preference = preferences.get(pk=preference_id)
+        except (Preference.DoesNotExist, ValueError, TypeError):
+            return Response({"error": "Preference not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            circuit = generate_circuit(preference)
+        except PlanningError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        circuit = circuit_detail_queryset(Circuit.objects.all()).get(pk=circuit.pk)
+        return Response(CircuitDetailSerializer(circuit).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Import many circuits at once (admin only): POST [{circuit with schedules}, ...]
+        Everything is validated first, then written in one transaction.
+        """
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can import circuits."}, status=status.HTTP_403_FORBIDDEN)
+        if not isinstance(request.data, list) or not request.data:
+            return Response({"error": "Expected a non-empty list of circuits."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.max_batch_size:
+            return Response(
+                {"error": f"At most {self.max_batch_size} circuits per batch."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        circuits = serializer.save()
+        return Response({
+            "created": len(circuits),
+            "circuits": [
+                {"id": circuit.id, "name": circuit.name, "circuit_code": circuit.circuit_code}
+                for circuit in circuits
+            ],
+        }, status=status.HTTP_201_CREATED)
 
 
 
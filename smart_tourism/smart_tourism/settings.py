@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import sys
 from pathlib import Path
 from datetime import timedelta
 
@@ -174,4 +175,70 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTHENTICATION_BACKENDS = [
     'users.backends.authentication.EmailBackend',  # Add your custom backend
     'django.contrib.auth.backends.ModelBackend',  # Default backend
-]
\ No newline at end of file
+]
+
+
+
+# Cache of the map clusters, candidate pools and circuit snapshots. They are
+# keyed by the shared generation counters below, so a change made by one
+# worker process retires the entries of the others.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smart-tourism',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Anonymous catalog responses (tourism/caching.py); FileBasedCache or a
+    # shared backend work the same
+    'catalog_responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smart-tourism-responses',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # Generation counters of the catalog models (tourism/caching.py): must be
+    # shared by every worker process, a file cache on one host or Redis/Memcached
+    'catalog_generations': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'catalog_generations',
+        'TIMEOUT': None,
+    },
+}
+
+CATALOG_RESPONSE_CACHE = {
+    'ALIAS': 'catalog_responses',
+    'GENERATION_ALIAS': 'catalog_generations',
+    'TIMEOUT': 5 * 60,  # seconds; model changes invalidate earlier
+}
+
+# Offline reverse geocoding: GeoJSON FeatureCollection of the governorate boundaries,
+# installed separately (not in the repository). While the file is missing, coordinates
+# resolve to the nearest Destination and the tourism.W001 check warns; None turns the
+# boundaries off knowingly.
+GOVERNORATE_BOUNDARIES_PATH = BASE_DIR / 'tourism' / 'data' / 'governorates.geojson'
+
+# Process-wide LRU cache of coordinate -> destination lookups used by the catalog models' save()
+GEOCODING_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 24 * 60 * 60,  # seconds
+    'PRECISION': 4,  # decimals the coordinates are rounded to (~11 m)
+}
+
+# Optional road distances between destinations (CSV: from_id,to_id,distance_km),
+# overriding the great-circle distances of the itinerary distance matrix
+ROAD_DISTANCES_PATH = BASE_DIR / 'itinerary' / 'data' / 'road_distances.csv'
+
+# Click tracking: clicks are queued in memory and written by a background thread
+CLICK_TRACKING = {
+    'FLUSH_INTERVAL_MS': 500,  # Longest a click waits in the queue
+    'BATCH_SIZE': 200,  # Clicks per bulk insert
+    'MAX_QUEUE': 10000,  # Clicks beyond this are dropped
+    'DEDUPE_MINUTES': 10,  # Same window as ClickHistory.user_recently_clicked
+}
+
+# In-memory prefix indexes (tourism/prefixes.py): catalog typeahead and popular
+# searches, built by a background thread from the first request the process
+# serves. Off for the test run, where that thread would read the database
+# outside the test transactions: tests build an index with refresh().
+PREFIX_INDEXES = {
+    'BUILD_IN_BACKGROUND': sys.argv[1:2] != ['test'],
+}
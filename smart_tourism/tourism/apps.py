@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class TourismConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tourism'
+
+    def ready(self):
+        from django.core import checks
+
+        from . import signals  # noqa: F401  Connect the signal receivers
+        from . import geocoding, prefixes, suggest
+
+        checks.register(geocoding.check_boundaries)
+        prefixes.start_on_first_request(suggest.index)
@@ -0,0 +1,152 @@
+"""
+Response cache of the anonymous catalog reads.
+
+List and retrieve responses for anonymous users are cached under the request
+path, the normalised query parameters and the generation counters of the
+models the response depends on. Saving or deleting a row of one of those
+models bumps its counter (post_save/post_delete receivers in signals.py), so
+every cached response built from the old data stops being addressed, without
+scanning or deleting keys.
+
+The responses are kept in settings.CATALOG_RESPONSE_CACHE['ALIAS'], any
+Django cache backend. The counters are kept in its 'GENERATION_ALIAS', which
+has to be shared by every worker (file, Redis, Memcached...) for a change
+handled by one worker to reach the others; the ETags (tourism.etags) are only
+built from shared counters.
+"""
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.response import Response
+
+_settings = getattr(settings, 'CATALOG_RESPONSE_CACHE', {})
+CACHE_ALIAS = _settings.get('ALIAS', 'default')
+GENERATION_ALIAS = _settings.get('GENERATION_ALIAS', CACHE_ALIAS)
+TIMEOUT = _settings.get('TIMEOUT', 5 * 60)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _generation_cache():
+    return caches[GENERATION_ALIAS]
+
+
+def generations_shared():
+    """Whether every worker sees the same counters (not a per-process memory cache)."""
+    return not isinstance(_generation_cache(), (LocMemCache, DummyCache))
+
+
+def generation_key(model):
+    return 'tourism:generation:%s' % model._meta.label_lower
+
+
+def generations(models):
+    """Current generation counter of each model."""
+    keys = [generation_key(model) for model in models]
+    found = _generation_cache().get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        # A counter lost by the cache restarts from a fresh value, never from an old one
+        _generation_cache().set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(model):
+    """
+    Give the model a new generation once the current transaction commits:
+    bumped earlier, a concurrent read could cache the old rows under it.
+    A fresh random value cannot collide with a concurrent bump the way an
+    increment of a non-atomic backend can.
+    """
+    transaction.on_commit(lambda: _generation_cache().set(generation_key(model), uuid.uuid4().hex, None))
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'alias': CACHE_ALIAS,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+stats = CacheStats()
+
+
+def request_signature(request, models):
+    """
+    Request path, normalised query parameters and generations of the models:
+    what a catalog response depends on. Computed once per request, the
+    response cache and the ETag share it.
+    """
+    models = tuple(models)
+    memo = getattr(request, '_catalog_signature', None)
+    if memo is None or memo[0] != models:
+        params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+        memo = (models, '%s?%s|%s' % (request.path, params, generations(models)))
+        request._catalog_signature = memo
+    return memo[1]
+
+
+def response_key(request, models):
+    raw = request_signature(request, models)
+    return 'tourism:response:%s' % hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+class CachedResponseMixin:
+    """
+    Serve list/retrieve to anonymous users from the response cache.
+    cache_dependencies lists the models, besides the viewset's own, whose
+    changes show in the responses.
+    """
+    cache_dependencies = ()
+
+    def cache_models(self):
+        return [self.queryset.model, *self.cache_dependencies]
+
+    def cached_response(self, request, compute, *args, **kwargs):
+        if request.user.is_authenticated:
+            return compute(request, *args, **kwargs)
+
+        key = response_key(request, self.cache_models())
+        cached = _cache().get(key)
+        stats.record(cached is not None)
+        if cached is not None:
+            data, status = cached
+            return Response(data, status=status, headers={'X-Cache': 'HIT'})
+
+        response = compute(request, *args, **kwargs)
+        if response.status_code == 200:
+            _cache().set(key, (response.data, response.status_code), TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,82 @@
+"""
+Conditional GET for the catalog and circuit endpoints.
+
+The ETag of a list/retrieve response is computed before any serialisation,
+without touching the catalog tables, from:
+
+- the request signature of the response cache (tourism.caching): path,
+  normalised query parameters and the generation counters of the models the
+  response depends on, bumped when one of their rows changes;
+- the Accept header (JSON or the browsable API);
+- for authenticated catalog reads, the user and the version of their
+  favorites of that type (count and latest updated_at, an index lookup),
+  since the rows carry an is_favorite flag.
+
+The counters have to be shared by every worker, otherwise a change handled by
+another worker would never change the tag: with a per-process cache as
+generation cache, no ETag is sent. A request whose If-None-Match holds the
+ETag gets an empty 304.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import caching
+from .models import Favorite
+
+
+def favorites_version(user, entity_type):
+    return tuple(
+        Favorite.objects.filter(user=user, entity_type=entity_type)
+        .aggregate(count=Count('pk'), updated=Max('updated_at')).values()
+    )
+
+
+def matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    # If-None-Match uses the weak comparison
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+class ConditionalGetMixin:
+    """
+    ETag / If-None-Match on list and retrieve. The models the response depends
+    on are the viewset's own plus its cache_dependencies (CachedResponseMixin)
+    or etag_dependencies.
+    """
+    etag_dependencies = None
+
+    def etag_models(self):
+        dependencies = self.etag_dependencies
+        if dependencies is None:
+            dependencies = getattr(self, 'cache_dependencies', ())
+        return [self.queryset.model, *dependencies]
+
+    def compute_etag(self, request):
+        parts = [caching.request_signature(request, self.etag_models()), request.META.get('HTTP_ACCEPT', '')]
+        if request.user.is_authenticated:
+            parts.append(request.user.pk)
+            if getattr(self, 'entity_type', None):
+                parts.append(favorites_version(request.user, self.entity_type))
+        return '"%s"' % hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+    def conditional_response(self, request, compute, *args, **kwargs):
+        if not caching.generations_shared():
+            return compute(request, *args, **kwargs)
+        etag = self.compute_etag(request)
+        if matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = compute(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
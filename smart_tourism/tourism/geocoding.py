@@ -0,0 +1,322 @@
+"""
+Offline reverse geocoding of catalog coordinates to governorates.
+
+The governorate boundaries are read once from a GeoJSON file
+(settings.GOVERNORATE_BOUNDARIES_PATH) and indexed on a regular lat/lon grid,
+so resolving a point only runs the point-in-polygon test against the few
+polygons whose bounding box covers its grid cell. When a point falls outside
+every polygon (coastline precision), the nearest Destination is used instead.
+No network access is needed.
+
+The boundary file is not part of the repository: until it is installed at the
+configured path, every point falls back to the nearest Destination, which the
+tourism.W001 system check and an error in the log report.
+
+Resolutions are memoised process-wide in a bounded LRU cache keyed on the
+rounded coordinates, so re-saving an existing catalog never resolves the same
+spot twice.
+"""
+import json
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.core import checks
+
+logger = logging.getLogger(__name__)
+
+# Grid cell size of the spatial index, in degrees (~11 km at Tunisian latitudes)
+GRID_CELL_DEGREES = 0.1
+
+# GeoJSON property keys that may hold the governorate name
+NAME_PROPERTIES = ('name', 'gouvernorat', 'governorate', 'shapeName', 'NAME_1', 'name_fr')
+
+
+# "Gouvernorat de Tunis", "Gouvernorat d'Ariana", "Gouvernorat Sfax"
+GOVERNORATE_PREFIX_RE = re.compile(r"^\s*gouvernorat\s+(?:de\s+|du\s+|d['’]\s*)?", re.IGNORECASE)
+
+
+def normalize_name(name):
+    """Lowercase, strip accents and the "Gouvernorat (de)" prefix of a governorate name."""
+    name = GOVERNORATE_PREFIX_RE.sub('', name).strip()
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return name.lower().replace('-', ' ').replace("'", ' ').strip()
+
+
+def _point_in_ring(lat, lon, ring):
+    """Ray casting test of a point against one polygon ring of (lon, lat) pairs."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > lat) != (yj > lat):
+            x_cross = (xj - xi) * (lat - yi) / (yj - yi) + xi
+            if lon < x_cross:
+                inside = not inside
+        j = i
+    return inside
+
+
+class Governorate:
+    def __init__(self, name, polygons):
+        self.name = name
+        # Each polygon is a list of rings: the outer ring followed by its holes
+        self.polygons = polygons
+        points = [point for polygon in polygons for ring in polygon for point in ring]
+        self.min_lon = min(p[0] for p in points)
+        self.max_lon = max(p[0] for p in points)
+        self.min_lat = min(p[1] for p in points)
+        self.max_lat = max(p[1] for p in points)
+
+    def contains(self, lat, lon):
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon):
+            return False
+        for polygon in self.polygons:
+            if _point_in_ring(lat, lon, polygon[0]) and not any(
+                _point_in_ring(lat, lon, hole) for hole in polygon[1:]
+            ):
+                return True
+        return False
+
+
+class GovernorateIndex:
+    """Grid-bucketed point-in-polygon index over the governorate boundaries."""
+
+    def __init__(self, governorates, cell_size=GRID_CELL_DEGREES):
+        self.governorates = governorates
+        self.cell_size = cell_size
+        self.cells = {}
+        for governorate in governorates:
+            for cell in self._cells_between(governorate.min_lat, governorate.min_lon,
+                                            governorate.max_lat, governorate.max_lon):
+                self.cells.setdefault(cell, []).append(governorate)
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lon / self.cell_size))
+
+    def _cells_between(self, min_lat, min_lon, max_lat, max_lon):
+        low_row, low_col = self._cell(min_lat, min_lon)
+        high_row, high_col = self._cell(max_lat, max_lon)
+        for row in range(low_row, high_row + 1):
+            for col in range(low_col, high_col + 1):
+                yield row, col
+
+    def locate(self, lat, lon):
+        """Return the Governorate containing the point, or None."""
+        for governorate in self.cells.get(self._cell(lat, lon), ()):
+            if governorate.contains(lat, lon):
+                return governorate
+        return None
+
+    @classmethod
+    def from_geojson(cls, path):
+        with open(path, encoding='utf-8') as handle:
+            data = json.load(handle)
+
+        governorates = []
+        for feature in data.get('features', []):
+            properties = feature.get('properties') or {}
+            name = next((properties[key] for key in NAME_PROPERTIES if properties.get(key)), None)
+            geometry = feature.get('geometry') or {}
+            if not name or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+                continue
+            coordinates = geometry['coordinates']
+            polygons = [coordinates] if geometry['type'] == 'Polygon' else coordinates
+            polygons = [[[tuple(point[:2]) for point in ring] for ring in polygon] for polygon in polygons]
+            governorates.append(Governorate(name, polygons))
+        return cls(governorates)
+
+
+class CoordinateCache:
+    """Thread-safe LRU cache of rounded (lat, lon) -> (governorate, destination id) with a TTL."""
+
+    def __init__(self, max_entries=10000, ttl=24 * 60 * 60, precision=4):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.precision = precision  # 4 decimals is about 11 m
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, lat, lon):
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class OfflineGeocoder:
+    """Resolves coordinates to a governorate name and Destination id without network calls."""
+
+    def __init__(self, boundaries_path=None, cache=None):
+        self.boundaries_path = boundaries_path
+        self.cache = cache or CoordinateCache()
+        self._lock = threading.Lock()
+        # (index, {normalized name: destination id}, [(id, name, lat, lon)]), replaced as a
+        # whole so a reset() never leaves a running lookup with half of the data
+        self._state = None
+
+    def _load(self):
+        from tourism.models import Destination  # Import inside to avoid circular import issues
+
+        with self._lock:
+            if self._state is not None:
+                return self._state
+
+            index = None
+            path = Path(self.boundaries_path) if self.boundaries_path else None
+            if path is None:
+                logger.info("No governorate boundaries configured, using the nearest destination.")
+            elif path.exists():
+                index = GovernorateIndex.from_geojson(path)
+            else:
+                logger.error("No governorate boundaries at %s, using the nearest destination instead.", path)
+
+            rows = list(Destination.objects.values_list('id', 'name', 'latitude', 'longitude'))
+            self._state = (index, {normalize_name(name): pk for pk, name, _, _ in rows}, rows)
+            return self._state
+
+    def reset(self):
+        """Forget the loaded boundaries, destinations and cached lookups (e.g. after a Destination change)."""
+        with self._lock:
+            self._state = None
+        self.cache.clear()
+
+    def _nearest(self, centroids, lat, lon):
+        best, best_distance = None, None
+        scale = math.cos(math.radians(lat))
+        for row in centroids:
+            d_lat = row[2] - lat
+            d_lon = (row[3] - lon) * scale
+            distance = d_lat * d_lat + d_lon * d_lon
+            if best_distance is None or distance < best_distance:
+                best, best_distance = row, distance
+        return best
+
+    def _destination_for(self, destinations, name):
+        """Match a governorate name to a destination id, tolerating partial names."""
+        key = normalize_name(name)
+        if key in destinations:
+            return destinations[key]
+        for destination_name, pk in destinations.items():
+            if key in destination_name or destination_name in key:
+                return pk
+        return None
+
+    def locate(self, lat, lon):
+        """Return a (governorate name, destination id) pair, or (None, None)."""
+        if lat is None or lon is None:
+            return None, None
+
+        key = self.cache.key(lat, lon)
+        result = self.cache.get(key)
+        if result is None:
+            result = self._resolve(*key)
+            self.cache.set(key, result)
+        return result
+
+    def _resolve(self, lat, lon):
+        state = self._state
+        if state is None:
+            state = self._load()
+        index, destinations, centroids = state
+
+        if index is not None:
+            governorate = index.locate(lat, lon)
+            if governorate is not None:
+                return governorate.name, self._destination_for(destinations, governorate.name)
+
+        nearest = self._nearest(centroids, lat, lon)
+        if nearest is None:
+            return None, None
+        return nearest[1], nearest[0]
+
+
+def check_boundaries(app_configs, **kwargs):
+    """System check: a configured boundary file that is missing leaves only the nearest-destination fallback."""
+    path = getattr(settings, 'GOVERNORATE_BOUNDARIES_PATH', None)
+    if path and not Path(path).exists():
+        return [checks.Warning(
+            f"No governorate boundaries at {path}: coordinates resolve to the nearest destination.",
+            hint="Install a GeoJSON FeatureCollection of the governorate boundaries there, "
+                 "or set GOVERNORATE_BOUNDARIES_PATH = None to use the nearest destination.",
+            id='tourism.W001',
+        )]
+    return []
+
+
+_cache_settings = getattr(settings, 'GEOCODING_CACHE', {})
+
+geocoder = OfflineGeocoder(
+    getattr(settings, 'GOVERNORATE_BOUNDARIES_PATH', None),
+    cache=CoordinateCache(
+        max_entries=_cache_settings.get('MAX_ENTRIES', 10000),
+        ttl=_cache_settings.get('TTL', 24 * 60 * 60),
+        precision=_cache_settings.get('PRECISION', 4),
+    ),
+)
+
+
+def get_governorate(lat, lon):
+    """Return the governorate name for the coordinates, or None."""
+    return geocoder.locate(lat, lon)[0]
+
+
+def resolve_destination(lat, lon):
+    """Return the id of the Destination the coordinates fall in, or None."""
+    return geocoder.locate(lat, lon)[1]
+
+
+def resolve_destinations(points):
+    """Resolve a batch of (lat, lon) pairs, looking each distinct rounded point up only once."""
+    resolved = {}
+    destination_ids = []
+    for lat, lon in points:
+        if lat is None or lon is None:
+            destination_ids.append(None)
+            continue
+        key = geocoder.cache.key(lat, lon)
+        if key not in resolved:
+            resolved[key] = geocoder.locate(*key)[1]
+        destination_ids.append(resolved[key])
+    return destination_ids
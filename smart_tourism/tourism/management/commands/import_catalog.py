@@ -0,0 +1,218 @@
+import csv
+import json
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from tourism import caching, geocoding, search, spatial
+from tourism.models import CATALOG_MODELS, Equipment
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import catalog entities (hotels, restaurants, guest houses, ...) from a CSV "
+        "or JSON-lines file. Rows are validated and written in chunks with bulk_create / "
+        "bulk_update; rows carrying an existing id are updated, only on the columns they provide."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON-lines file to import.")
+        parser.add_argument('--type', required=True, choices=sorted(CATALOG_MODELS), dest='entity_type')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--delimiter', default=',', help="CSV delimiter.")
+
+    def handle(self, *args, **options):
+        self.entity_type = options['entity_type']
+        self.model = CATALOG_MODELS[self.entity_type]
+        file_format = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.json')) else 'csv')
+
+        self.fields = {f.name: f for f in self.model._meta.concrete_fields if not f.primary_key}
+        self.has_equipments = any(f.name == 'equipments' for f in self.model._meta.many_to_many)
+        if self.has_equipments:
+            # The equipment table is small; load it once to validate ids without a query per row
+            self.equipments = Equipment.objects.in_bulk()
+            self.equipment_flag = 'hotel' if self.entity_type == 'hotel' else 'guest_house'
+
+        totals = {'created': 0, 'updated': 0, 'skipped': 0}
+        started = time.monotonic()
+
+        try:
+            with open(options['path'], encoding='utf-8', newline='') as handle:
+                rows = self.read_rows(handle, file_format, options['delimiter'])
+                line = 0
+                while True:
+                    chunk = list(islice(rows, options['chunk_size']))
+                    if not chunk:
+                        break
+                    created, updated, skipped = self.import_chunk(chunk, first_line=line + 1)
+                    line += len(chunk)
+                    totals['created'] += created
+                    totals['updated'] += updated
+                    totals['skipped'] += skipped
+
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f"{line} rows processed ({totals['created']} created, {totals['updated']} updated, "
+                        f"{totals['skipped']} skipped) - {line / elapsed * 60 if elapsed else 0:.0f} rows/min"
+                    )
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.model.__name__}: {totals['created']} created, {totals['updated']} updated, "
+            f"{totals['skipped']} skipped in {time.monotonic() - started:.1f}s."
+        ))
+
+    def read_rows(self, handle, file_format, delimiter):
+        """Stream the input as dicts without loading the whole file."""
+        if file_format == 'csv':
+            yield from csv.DictReader(handle, delimiter=delimiter)
+            return
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+    def build(self, row):
+        """
+        Turn an input row into an unsaved model instance, the names of the
+        fields the row provides and its equipment ids (None without the column).
+        """
+        obj = self.model()
+        provided = set()
+        for key, value in row.items():
+            if value == '':
+                value = None
+            if key == 'id':
+                obj.pk = int(value) if value is not None else None
+                continue
+            name = key[:-3] if key.endswith('_id') else key
+            field = self.fields.get(name)
+            # The destination is derived from the coordinates, as in save()
+            if field is not None and name != 'destination':
+                setattr(obj, field.attname, value)
+                provided.add(name)
+
+        equipment_ids = None
+        if self.has_equipments and 'equipments' in row:
+            value = row['equipments'] or []
+            if isinstance(value, str):
+                value = value.replace('|', ',').split(',')
+            equipment_ids = [int(v) for v in value if str(v).strip()]
+        return obj, provided, equipment_ids
+
+    def validate_equipments(self, equipment_ids):
+        if equipment_ids is None:
+            return
+        unknown = [pk for pk in equipment_ids if pk not in self.equipments]
+        if unknown:
+            raise ValidationError({'equipments': f"Unknown equipments: {unknown}"})
+        invalid = [pk for pk in equipment_ids if not getattr(self.equipments[pk], self.equipment_flag)]
+        if invalid:
+            raise ValidationError({'equipments': f"Equipments not valid for {self.equipment_flag}: {invalid}"})
+
+    def import_chunk(self, chunk, first_line):
+        built = []
+        skipped = 0
+        for offset, row in enumerate(chunk):
+            try:
+                built.append((offset, *self.build(row)))
+            except (ValueError, TypeError) as e:
+                skipped += 1
+                self.stderr.write(f"Line {first_line + offset}: {e}")
+
+        given_ids = [obj.pk for _, obj, _, _ in built if obj.pk is not None]
+        existing = set(self.model.objects.filter(pk__in=given_ids).values_list('pk', flat=True))
+
+        objects, provided, links = [], [], []
+        for offset, obj, fields, equipment_ids in built:
+            # An update is only checked on the columns its row provides
+            exclude = ['destination']
+            if obj.pk in existing:
+                exclude += [name for name in self.fields if name not in fields]
+            try:
+                obj.full_clean(exclude=exclude, validate_unique=False)
+                if self.has_equipments:
+                    self.validate_equipments(equipment_ids)
+            except (ValidationError, ValueError, TypeError) as e:
+                skipped += 1
+                self.stderr.write(f"Line {first_line + offset}: {e}")
+                continue
+            objects.append(obj)
+            provided.append(fields)
+            links.append(equipment_ids)
+
+        if not objects:
+            return 0, 0, skipped
+
+        # One pass over the chunk's distinct coordinates instead of a lookup per row
+        destination_ids = geocoding.resolve_destinations([(o.latitude, o.longitude) for o in objects])
+        for obj, fields, destination_id in zip(objects, provided, destination_ids):
+            if destination_id:
+                obj.destination_id = destination_id
+                fields.add('destination')
+
+        to_update = [o for o in objects if o.pk in existing]
+        to_create = [o for o in objects if o.pk not in existing]
+
+        # An update only writes the columns of its row: the missing ones keep their
+        # stored value. Rows are grouped by column set, one bulk_update per group.
+        update_groups = defaultdict(list)
+        for obj, fields in zip(objects, provided):
+            if obj.pk in existing:
+                fields.discard('created_at')
+                if 'updated_at' in self.fields:
+                    fields.add('updated_at')
+                update_groups[frozenset(fields)].append(obj)
+
+        with transaction.atomic():
+            self.model.objects.bulk_create(to_create)
+            if any(o.pk is not None for o in to_create):
+                self.reset_sequence()
+            now = timezone.now()
+            for fields, group in update_groups.items():
+                if 'updated_at' in fields:
+                    for obj in group:
+                        obj.updated_at = now
+                if fields:
+                    self.model.objects.bulk_update(group, sorted(fields))
+            if self.has_equipments:
+                self.write_equipments(objects, links, existing)
+            # bulk writes skip post_save, so index the chunk here; the updated
+            # rows are read back, their input may only hold some of the columns
+            indexed = to_create + list(self.model.objects.filter(pk__in=[o.pk for o in to_update]))
+            search.index_instances(self.entity_type, indexed)
+            spatial.index_instances(self.entity_type, indexed)
+            caching.bump(self.model)
+
+        return len(to_create), len(to_update), skipped
+
+    def reset_sequence(self):
+        """Rows created with explicit ids do not advance the id sequence: move it past them."""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [self.model]):
+                cursor.execute(sql)
+
+    def write_equipments(self, objects, links, existing):
+        """
+        Replace the equipment links of the rows having an equipments column with
+        one delete and one insert on the through table.
+        """
+        field = self.model.equipments.field
+        through = field.remote_field.through
+        source = field.m2m_field_name() + '_id'
+        target = field.m2m_reverse_field_name() + '_id'
+        replaced = [obj.pk for obj, ids in zip(objects, links) if ids is not None and obj.pk in existing]
+        if replaced:
+            through.objects.filter(**{f'{source}__in': replaced}).delete()
+        through.objects.bulk_create(
+            [through(**{source: obj.pk, target: pk}) for obj, ids in zip(objects, links) for pk in ids or ()],
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from tourism import caching, ratings
+from tourism.models import CATALOG_MODELS
+
+
+class Command(BaseCommand):
+    help = "Recompute the rating summaries (RatingSummary) from the reviews."
+
+    def handle(self, *args, **options):
+        count = ratings.rebuild()
+        # The catalog responses show the ratings
+        for model in CATALOG_MODELS.values():
+            caching.bump(model)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} rating summaries."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from tourism import search
+from tourism.models import CATALOG_MODELS
+
+
+class Command(BaseCommand):
+    help = "Rebuild the catalog search index (SearchTerm) from the catalog tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('entity_types', nargs='*', choices=sorted(CATALOG_MODELS),
+                            help="Entity types to reindex (all by default).")
+
+    def handle(self, *args, **options):
+        count = search.rebuild(options['entity_types'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} catalog rows."))
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2025-04-14 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0012_delete_hotelequipment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(max_length=30)),
+                ('entity_id', models.IntegerField()),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+            ],
+            options={
+                'db_table': 'search_term',
+                'indexes': [
+                    models.Index(fields=['entity_type', 'term'], name='search_term_type_term_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+                    models.Index(fields=['term'], name='search_term_term_idx', opclasses=['varchar_pattern_ops']),
+                    models.Index(fields=['entity_type', 'entity_id'], name='search_term_entity_idx'),
+                ],
+            },
+        ),
+    ]
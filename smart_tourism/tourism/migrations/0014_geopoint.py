@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2025-04-15 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0013_searchterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeoPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(max_length=30)),
+                ('entity_id', models.IntegerField()),
+                ('geohash', models.CharField(max_length=12)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+            ],
+            options={
+                'db_table': 'geo_point',
+                'indexes': [
+                    models.Index(fields=['entity_type', 'geohash'], name='geo_point_type_geohash_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+                    models.Index(fields=['geohash'], name='geo_point_geohash_idx', opclasses=['varchar_pattern_ops']),
+                    models.Index(fields=['entity_type', 'entity_id'], name='geo_point_entity_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2025-04-16 10:12
+
+from django.db import migrations, models
+
+
+# Reviews of archaeological sites were stored as 'archaeological_sites'
+BACKFILL_SQL = """
+INSERT INTO rating_summary (entity_type, entity_id, count, total, rating_1, rating_2, rating_3, rating_4, rating_5)
+SELECT CASE entity_type WHEN 'archaeological_sites' THEN 'archaeological_site' ELSE entity_type END,
+       entity_id,
+       COUNT(*),
+       SUM(rating),
+       COUNT(*) FILTER (WHERE rating = 1),
+       COUNT(*) FILTER (WHERE rating = 2),
+       COUNT(*) FILTER (WHERE rating = 3),
+       COUNT(*) FILTER (WHERE rating = 4),
+       COUNT(*) FILTER (WHERE rating = 5)
+FROM review
+GROUP BY 1, 2
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0014_geopoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(max_length=50)),
+                ('entity_id', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'rating_summary',
+                'unique_together': {('entity_type', 'entity_id')},
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
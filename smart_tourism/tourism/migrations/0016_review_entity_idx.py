@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2025-04-16 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tourism', '0015_ratingsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['entity_type', 'entity_id'], name='review_entity_idx'),
+        ),
+    ]
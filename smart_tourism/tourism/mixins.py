@@ -0,0 +1,87 @@
+from rest_framework.exceptions import ValidationError
+
+from .models import Favorite
+from .pagination import CatalogPagination
+from .ratings import annotate_ratings
+from .search import search_queryset
+from .spatial import MAX_RADIUS_KM, near_queryset
+
+
+class CatalogQuerysetMixin:
+    """
+    Shared queryset handling for the catalog viewsets.
+
+    Each viewset declares how the relations its serializer renders are loaded:
+    select_related_fields for foreign keys and prefetch_related_fields for
+    many-to-many fields, so a list response costs a fixed number of queries
+    whatever the number of rows.
+
+    Lists are paginated with CatalogPagination (page numbers, or keyset with
+    ?pagination=cursor), ?search= goes through the search index of the
+    viewset's entity_type and ?near=lat,lon&radius_km= through the geohash index.
+    Rows carry their review count and rating total from the rating summaries,
+    and authenticated users get an is_favorite flag from one Favorite query per page.
+    """
+    default_radius_km = 10
+    entity_type = None
+    pagination_class = CatalogPagination
+    select_related_fields = ('destination',)
+    prefetch_related_fields = ()
+
+    def get_base_queryset(self):
+        queryset = self.queryset.all()
+        if self.select_related_fields:
+            queryset = queryset.select_related(*self.select_related_fields)
+        if self.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*self.prefetch_related_fields)
+        return annotate_ratings(queryset, self.entity_type)
+
+    def filter_search(self, queryset):
+        """Apply ?search=, keeping the best matches first."""
+        search = self.request.query_params.get('search', None)
+        if search:
+            queryset = search_queryset(queryset, self.entity_type, search)
+        return queryset
+
+    def filter_near(self, queryset):
+        """Apply ?near=lat,lon&radius_km=, nearest first."""
+        near = self.request.query_params.get('near', None)
+        if not near:
+            return queryset
+        try:
+            lat, lon = (float(value) for value in near.split(','))
+            radius_km = float(self.request.query_params.get('radius_km', self.default_radius_km))
+        except ValueError:
+            raise ValidationError({'near': "Expected near=<latitude>,<longitude> and a numeric radius_km."})
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValidationError({'near': "Coordinates out of range."})
+        if not 0 < radius_km <= MAX_RADIUS_KM:
+            raise ValidationError({'radius_km': f"radius_km must be between 0 and {MAX_RADIUS_KM}."})
+        return near_queryset(queryset, self.entity_type, lat, lon, radius_km)
+
+    def load_favorite_ids(self, rows):
+        """Ids among the rows that the user has in their favorites (None for anonymous users)."""
+        user = self.request.user
+        if not user.is_authenticated:
+            return None
+        return set(
+            Favorite.objects.filter(user=user, entity_type=self.entity_type, entity_id__in=[obj.pk for obj in rows])
+            .values_list('entity_id', flat=True)
+        )
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.favorite_ids = self.load_favorite_ids(page)
+        return page
+
+    def get_object(self):
+        obj = super().get_object()
+        if self.action == 'retrieve':
+            self.favorite_ids = self.load_favorite_ids([obj])
+        return obj
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['favorite_ids'] = getattr(self, 'favorite_ids', None)
+        return context
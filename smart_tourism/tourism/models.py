@@ -1,10 +1,12 @@
+import logging
+
 from django.db import models
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
-import requests
 from users.models import CustomUser
+from . import geocoding
 from django.core.validators import MinValueValidator, MaxValueValidator, URLValidator, RegexValidator
 
+logger = logging.getLogger(__name__)
+
 
 # Create your models here.
 
@@ -230,40 +232,17 @@ class Restaurant(models.Model):
 
     @staticmethod
     def get_governorate(lat, lon):
-        """Fetch the governorate name from OpenStreetMap API."""
-        if lat is None or lon is None:
-            return None  # Avoid making API calls if coordinates are missing
-
-        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}"
-        headers = {
-            "Accept-Language": "fr",  # Get response in French
-            "User-Agent": "smart_tourism/1.0 (emnaborji2578@gmail.com)"  # Required User-Agent
-        }
-
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            response.raise_for_status()  # Raise error if the request fails
-            data = response.json()
-            return data.get('address', {}).get('state', "Inconnu")  # Get 'state' field
-        except requests.RequestException as e:
-            print(f"Error fetching governorate: {e}")
-            return None
+        """Resolve the governorate name locally from the boundary polygons."""
+        return geocoding.get_governorate(lat, lon)
 
     def save(self, *args, **kwargs):
         self.full_clean()
         """Automatically set the destination before saving the restaurant."""
-        governorate = self.get_governorate(self.latitude, self.longitude)
-        if governorate:
-            # Normalize governorate name
-            normalized_governorate = governorate.replace("Gouvernorat ", "").strip()
-
-            # Search for the corresponding destination
-            destination = Destination.objects.filter(name__icontains=normalized_governorate).first()
-
-            if destination:
-                self.destination = destination
-            else:
-                print(f"Destination not found for governorate: {governorate}")
+        destination_id = geocoding.resolve_destination(self.latitude, self.longitude)
+        if destination_id:
+            self.destination_id = destination_id
+        elif self.latitude is not None and self.longitude is not None:
+            logger.warning("Destination not found for coordinates: %s, %s", self.latitude, self.longitude)
 
         super().save(*args, **kwargs)
         
@@ -389,40 +368,17 @@ class Activity(models.Model):
     
     @staticmethod
     def get_governorate(lat, lon):
-        """Fetch the governorate name from OpenStreetMap API."""
-        if lat is None or lon is None:
-            return None  # Avoid making API calls if coordinates are missing
-
-        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}"
-        headers = {
-            "Accept-Language": "fr",  # Get response in French
-            "User-Agent": "smart_tourism/1.0 (emnaborji2578@gmail.com)"  # Required User-Agent
-        }
-
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            response.raise_for_status()  # Raise error if the request fails
-            data = response.json()
-            return data.get('address', {}).get('state', "Inconnu")  # Get 'state' field
-        except requests.RequestException as e:
-            print(f"Error fetching governorate: {e}")
-            return None
+        """Resolve the governorate name locally from the boundary polygons."""
+        return geocoding.get_governorate(lat, lon)
 
     def save(self, *args, **kwargs):
         self.full_clean()
         """Automatically set the destination before saving the activity."""
-        governorate = self.get_governorate(self.latitude, self.longitude)
-        if governorate:
-            # Normalize governorate name
-            normalized_governorate = governorate.replace("Gouvernorat ", "").strip()
-
-            # Search for the corresponding destination
-            destination = Destination.objects.filter(name__icontains=normalized_governorate).first()
-
-            if destination:
-                self.destination = destination
-            else:
-                print(f"Destination not found for governorate: {governorate}")
+        destination_id = geocoding.resolve_destination(self.latitude, self.longitude)
+        if destination_id:
+            self.destination_id = destination_id
+        elif self.latitude is not None and self.longitude is not None:
+            logger.warning("Destination not found for coordinates: %s, %s", self.latitude, self.longitude)
 
         super().save(*args, **kwargs)
     
@@ -456,40 +412,17 @@ class ArchaeologicalSite(models.Model):
     
     @staticmethod
     def get_governorate(lat, lon):
-        """Fetch the governorate name from OpenStreetMap API."""
-        if lat is None or lon is None:
-            return None  # Avoid making API calls if coordinates are missing
-
-        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}"
-        headers = {
-            "Accept-Language": "fr",  # Get response in French
-            "User-Agent": "smart_tourism/1.0 (emnaborji2578@gmail.com)"  # Required User-Agent
-        }
-
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            response.raise_for_status()  # Raise error if the request fails
-            data = response.json()
-            return data.get('address', {}).get('state', "Inconnu")  # Get 'state' field
-        except requests.RequestException as e:
-            print(f"Error fetching governorate: {e}")
-            return None
+        """Resolve the governorate name locally from the boundary polygons."""
+        return geocoding.get_governorate(lat, lon)
 
     def save(self, *args, **kwargs):
         self.full_clean()
         """Automatically set the destination before saving the archaeological site."""
-        governorate = self.get_governorate(self.latitude, self.longitude)
-        if governorate:
-            # Normalize governorate name
-            normalized_governorate = governorate.replace("Gouvernorat ", "").strip()
-
-            # Search for the corresponding destination
-            destination = Destination.objects.filter(name__icontains=normalized_governorate).first()
-
-            if destination:
-                self.destination = destination
-            else:
-                print(f"Destination not found for governorate: {governorate}")
+        destination_id = geocoding.resolve_destination(self.latitude, self.longitude)
+        if destination_id:
+            self.destination_id = destination_id
+        elif self.latitude is not None and self.longitude is not None:
+            logger.warning("Destination not found for coordinates: %s, %s", self.latitude, self.longitude)
 
         super().save(*args, **kwargs)
     
@@ -531,40 +464,17 @@ class Festival(models.Model):
     
     @staticmethod
     def get_governorate(lat, lon):
-        """Fetch the governorate name from OpenStreetMap API."""
-        if lat is None or lon is None:
-            return None  # Avoid making API calls if coordinates are missing
-
-        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}"
-        headers = {
-            "Accept-Language": "fr",  # Get response in French
-            "User-Agent": "smart_tourism/1.0 (emnaborji2578@gmail.com)"  # Required User-Agent
-        }
-
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            response.raise_for_status()  # Raise error if the request fails
-            data = response.json()
-            return data.get('address', {}).get('state', "Inconnu")  # Get 'state' field
-        except requests.RequestException as e:
-            print(f"Error fetching governorate: {e}")
-            return None
+        """Resolve the governorate name locally from the boundary polygons."""
+        return geocoding.get_governorate(lat, lon)
 
     def save(self, *args, **kwargs):
         self.full_clean()
         """Automatically set the destination before saving the festival."""
-        governorate = self.get_governorate(self.latitude, self.longitude)
-        if governorate:
-            # Normalize governorate name
-            normalized_governorate = governorate.replace("Gouvernorat ", "").strip()
-
-            # Search for the corresponding destination
-            destination = Destination.objects.filter(name__icontains=normalized_governorate).first()
-
-            if destination:
-                self.destination = destination
-            else:
-                print(f"Destination not found for governorate: {governorate}")
+        destination_id = geocoding.resolve_destination(self.latitude, self.longitude)
+        if destination_id:
+            self.destination_id = destination_id
+        elif self.latitude is not None and self.longitude is not None:
+            logger.warning("Destination not found for coordinates: %s, %s", self.latitude, self.longitude)
 
         super().save(*args, **kwargs)
 
@@ -641,40 +551,17 @@ class GuestHouse(models.Model):
     
     @staticmethod
     def get_governorate(lat, lon):
-        """Fetch the governorate name from OpenStreetMap API."""
-        if lat is None or lon is None:
-            return None  # Avoid making API calls if coordinates are missing
-
-        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}"
-        headers = {
-            "Accept-Language": "fr",  # Get response in French
-            "User-Agent": "smart_tourism/1.0 (emnaborji2578@gmail.com)"  # Required User-Agent
-        }
-
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            response.raise_for_status()  # Raise error if the request fails
-            data = response.json()
-            return data.get('address', {}).get('state', "Inconnu")  # Get 'state' field
-        except requests.RequestException as e:
-            print(f"Error fetching governorate: {e}")
-            return None
+        """Resolve the governorate name locally from the boundary polygons."""
+        return geocoding.get_governorate(lat, lon)
 
     def save(self, *args, **kwargs):
         self.full_clean()
         """Automatically set the destination before saving the guest house."""
-        governorate = self.get_governorate(self.latitude, self.longitude)
-        if governorate:
-            # Normalize governorate name
-            normalized_governorate = governorate.replace("Gouvernorat ", "").strip()
-
-            # Search for the corresponding destination
-            destination = Destination.objects.filter(name__icontains=normalized_governorate).first()
-
-            if destination:
-                self.destination = destination
-            else:
-                print(f"Destination not found for governorate: {governorate}")
+        destination_id = geocoding.resolve_destination(self.latitude, self.longitude)
+        if destination_id:
+            self.destination_id = destination_id
+        elif self.latitude is not None and self.longitude is not None:
+            logger.warning("Destination not found for coordinates: %s, %s", self.latitude, self.longitude)
 
         super().save(*args, **kwargs)
 
@@ -737,24 +624,8 @@ class Hotel(models.Model):
 
     @staticmethod
     def get_governorate(lat, lon):
-        """Fetch the governorate name from OpenStreetMap API."""
-        if lat is None or lon is None:
-            return None  # Avoid making API calls if coordinates are missing
-
-        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}"
-        headers = {
-            "Accept-Language": "fr",  # Get response in French
-            "User-Agent": "smart_tourism/1.0 (emnaborji2578@gmail.com)"  # Required User-Agent
-        }
-
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            response.raise_for_status()  # Raise error if the request fails
-            data = response.json()
-            return data.get('address', {}).get('state', "Inconnu")  # Get 'state' field
-        except requests.RequestException as e:
-            print(f"Error fetching governorate: {e}")
-            return None
+        """Resolve the governorate name locally from the boundary polygons."""
+        return geocoding.get_governorate(lat, lon)
 
     def save(self, *args, **kwargs):
         """Ensure data consistency before saving the hotel."""
@@ -767,18 +638,11 @@ class Hotel(models.Model):
         if self.phone and not self.phone.isdigit():
             raise ValueError("Phone number should contain only digits.")
         """Automatically set the destination before saving the hotel."""
-        governorate = self.get_governorate(self.latitude, self.longitude)
-        if governorate:
-            from tourism.models import Destination  # Import inside to avoid circular import issues
-            
-            normalized_governorate = governorate.replace("Gouvernorat ", "").strip()
-
-            destination = Destination.objects.filter(name__icontains=normalized_governorate).first()
-
-            if destination:
-                self.destination = destination
-            else:
-                print(f"Destination not found for governorate: {governorate}")
+        destination_id = geocoding.resolve_destination(self.latitude, self.longitude)
+        if destination_id:
+            self.destination_id = destination_id
+        elif self.latitude is not None and self.longitude is not None:
+            logger.warning("Destination not found for coordinates: %s, %s", self.latitude, self.longitude)
         super().save(*args, **kwargs)
 
 
@@ -927,40 +791,17 @@ class Museum(models.Model):
 
     @staticmethod
     def get_governorate(lat, lon):
-        """Fetch the governorate name from OpenStreetMap API."""
-        if lat is None or lon is None:
-            return None  # Avoid making API calls if coordinates are missing
-
-        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}"
-        headers = {
-            "Accept-Language": "fr",  # Get response in French
-            "User-Agent": "smart_tourism/1.0 (emnaborji2578@gmail.com)"  # Required User-Agent
-        }
-
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            response.raise_for_status()  # Raise error if the request fails
-            data = response.json()
-            return data.get('address', {}).get('state', "Inconnu")  # Get 'state' field
-        except requests.RequestException as e:
-            print(f"Error fetching governorate: {e}")
-            return None
+        """Resolve the governorate name locally from the boundary polygons."""
+        return geocoding.get_governorate(lat, lon)
 
     def save(self, *args, **kwargs):
         self.full_clean()
         """Automatically set the destination before saving the museum."""
-        governorate = self.get_governorate(self.latitude, self.longitude)
-        if governorate:
-            # Normalize governorate name
-            normalized_governorate = governorate.replace("Gouvernorat ", "").strip()
-
-            # Search for the corresponding destination
-            destination = Destination.objects.filter(name__icontains=normalized_governorate).first()
-
-            if destination:
-                self.destination = destination
-            else:
-                print(f"Destination not found for governorate: {governorate}")
+        destination_id = geocoding.resolve_destination(self.latitude, self.longitude)
+        if destination_id:
+            self.destination_id = destination_id
+        elif self.latitude is not None and self.longitude is not None:
+            logger.warning("Destination not found for coordinates: %s, %s", self.latitude, self.longitude)
 
         super().save(*args, **kwargs)
 
@@ -988,6 +829,10 @@ class Review(models.Model):
 
     class Meta:
         db_table = 'review'
+        indexes = [
+            # ReviewViewSet and the rating summaries look reviews up by entity
+            models.Index(fields=['entity_type', 'entity_id'], name='review_entity_idx'),
+        ]
         constraints = [
             models.CheckConstraint(check=models.Q(rating__gte=1, rating__lte=5), name='rating_check'),
         ]
@@ -997,6 +842,33 @@ class Review(models.Model):
     
 
 
+class RatingSummary(models.Model):
+    """
+    Review count, rating total and 1-5 histogram of one catalog entity.
+    Maintained incrementally from the Review signals (tourism.ratings).
+    """
+    entity_type = models.CharField(max_length=50)
+    entity_id = models.IntegerField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)  # Sum of the ratings
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'rating_summary'
+        unique_together = ('entity_type', 'entity_id')
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    def __str__(self):
+        return f"{self.entity_type} #{self.entity_id}: {self.count} reviews"
+
+
 class Favorite(models.Model):
     # Choices for entity_type
     ENTITY_TYPES = [
@@ -1024,3 +896,70 @@ class Favorite(models.Model):
     def __str__(self):
         return f"{self.user.username} favorite - {self.entity_type} {self.entity_id}"
     
+
+
+
+class SearchTerm(models.Model):
+    """
+    Inverted index of the catalog names and descriptions: one row per
+    (entity, normalized term) with the term's weight. Maintained by tourism.search.
+    """
+    entity_type = models.CharField(max_length=30)
+    entity_id = models.IntegerField()
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    class Meta:
+        db_table = 'search_term'
+        indexes = [
+            # Prefix lookups (term LIKE 'abc%'); the pattern opclasses only apply on PostgreSQL
+            models.Index(fields=['entity_type', 'term'], name='search_term_type_term_idx',
+                         opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+            models.Index(fields=['term'], name='search_term_term_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['entity_type', 'entity_id'], name='search_term_entity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.entity_type} {self.entity_id}"
+
+
+
+class GeoPoint(models.Model):
+    """
+    Geohash index of the catalog coordinates: one row per located catalog entity.
+    Maintained by tourism.spatial.
+    """
+    entity_type = models.CharField(max_length=30)
+    entity_id = models.IntegerField()
+    geohash = models.CharField(max_length=12)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+
+    class Meta:
+        db_table = 'geo_point'
+        indexes = [
+            # Prefix lookups on the geohash cells; the pattern opclasses only apply on PostgreSQL
+            models.Index(fields=['entity_type', 'geohash'], name='geo_point_type_geohash_idx',
+                         opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+            models.Index(fields=['geohash'], name='geo_point_geohash_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['entity_type', 'entity_id'], name='geo_point_entity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.entity_type} {self.entity_id} @ {self.geohash}"
+
+
+
+# Catalog models keyed by the entity_type vocabulary of Favorite and SearchHistory
+CATALOG_MODELS = {
+    'hotel': Hotel,
+    'restaurant': Restaurant,
+    'guest_house': GuestHouse,
+    'museum': Museum,
+    'festival': Festival,
+    'activity': Activity,
+    'archaeological_site': ArchaeologicalSite,
+}
+
+# entity_type of each catalog model
+CATALOG_ENTITY_TYPES = {model: entity_type for entity_type, model in CATALOG_MODELS.items()}
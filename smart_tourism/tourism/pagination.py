@@ -0,0 +1,144 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset (cursor) pagination.
+
+    The page is ordered on (sort field, id), where the sort field is whatever the
+    view ordered the queryset by (price, search rank, ...), falling back to
+    created_at and then id. The cursor holds the last (value, id) pair seen, so a
+    deep page is an indexed range scan rather than an OFFSET over every row before it.
+    Rows with a NULL sort value come last.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_keyset_field(self, queryset):
+        """Return (field name, descending) from the queryset's current ordering."""
+        ordering = [o for o in queryset.query.order_by if isinstance(o, str)]
+        if ordering and ordering[0] not in ('?', 'pk', '-pk', 'id', '-id'):
+            return ordering[0].lstrip('-'), ordering[0].startswith('-')
+        if any(f.name == 'created_at' for f in queryset.model._meta.concrete_fields):
+            return 'created_at', False
+        return 'pk', False
+
+    def encode_cursor(self, value, pk):
+        data = json.dumps({'v': None if value is None else str(value), 'id': pk})
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor, model, field):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            value, pk = data['v'], int(data['id'])
+            if value is not None:
+                try:
+                    value = model._meta.get_field(field).to_python(value)
+                except FieldDoesNotExist:
+                    value = float(value)  # An annotation such as a relevance score
+            return value, pk
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        field, descending = self.get_keyset_field(queryset)
+        page_size = self.get_page_size(request)
+
+        if field == 'pk':
+            queryset = queryset.order_by('-pk' if descending else 'pk')
+        elif descending:
+            queryset = queryset.order_by(F(field).desc(nulls_last=True), '-pk')
+        else:
+            queryset = queryset.order_by(F(field).asc(nulls_last=True), 'pk')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor, queryset.model, field)
+            after = 'lt' if descending else 'gt'
+            if field == 'pk':
+                queryset = queryset.filter(**{f'pk__{after}': pk})
+            elif value is None:
+                queryset = queryset.filter(**{f'{field}__isnull': True, f'pk__{after}': pk})
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__{after}': value}) |
+                    Q(**{field: value, f'pk__{after}': pk}) |
+                    Q(**{f'{field}__isnull': True})
+                )
+
+        rows = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, field) if field != 'pk' else None, last.pk)
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+
+class CatalogPagination(PageNumberPagination):
+    """
+    Page-number pagination for the catalog list endpoints (?page=, ?page_size=).
+    Passing ?pagination=cursor (or a ?cursor= from a previous page) switches to
+    KeysetPagination, which stays cheap on deep pages.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if not isinstance(queryset, QuerySet):
+            return super().paginate_queryset(queryset, request, view)  # Already ordered list, e.g. search hits
+
+        if request.query_params.get('pagination') == 'cursor' or self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        return super().paginate_queryset(self.with_tiebreaker(queryset), request, view)
+
+    def with_tiebreaker(self, queryset):
+        """
+        Order ties on the pk: rows sharing a sort value (equal prices, ...) could
+        otherwise come in a different order for each page's query, and repeat or
+        be skipped across pages.
+        """
+        if not queryset.ordered:
+            return queryset.order_by('pk')  # Stable pages for unsorted lists
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if ordering and isinstance(ordering[-1], str) and ordering[-1].lstrip('-') in ('pk', queryset.model._meta.pk.name):
+            return queryset
+        return queryset.order_by(*ordering, 'pk')
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,110 @@
+"""
+In-memory prefix indexes (catalog typeahead, popular searches).
+
+An index keeps sorted keys so the entries starting with a prefix are a bisect
+range. Its data is built from the database by a background thread, at the
+first request the process serves and then every `reload_seconds`, and
+published with one swap under the lock: lookups never touch the database and
+answer from whatever is loaded (nothing before the first build). Between two
+builds, the changes made by this process are applied incrementally by the
+subclass; the ones made by other processes arrive with the next build.
+
+settings.PREFIX_INDEXES['BUILD_IN_BACKGROUND'] = False leaves the builds to
+explicit refresh() calls (the test run does).
+"""
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Results of prefixes up to this length are memoised, their ranges being the largest
+MEMO_PREFIX_LENGTH = 2
+
+
+def start_on_first_request(index):
+    """
+    Start the index builds when the process serves its first request. Not from
+    AppConfig.ready(): that also runs for management commands such as migrate.
+    """
+    uid = f'prefix_index_{index.name}'
+
+    def start(sender, **kwargs):
+        request_started.disconnect(dispatch_uid=uid)
+        index.start()
+
+    request_started.connect(start, weak=False, dispatch_uid=uid)
+
+
+def prefix_range(keys, prefix, key=None):
+    """(low, high) bounds of the sorted keys starting with prefix."""
+    return bisect_left(keys, prefix, key=key), bisect_left(keys, prefix + '\uffff', key=key)
+
+
+class PrefixIndex(ABC):
+    """
+    Subclasses implement build() (read the database, return the data) and
+    install(data) (publish it, called under the lock).
+    """
+    name = 'prefix index'
+
+    def __init__(self, reload_seconds):
+        self.reload_seconds = reload_seconds
+        self.loaded = False
+        self._memo = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @abstractmethod
+    def build(self):
+        """Read the data from the database."""
+
+    @abstractmethod
+    def install(self, data):
+        """Publish the data built, under the lock."""
+
+    def refresh(self):
+        data = self.build()
+        with self._lock:
+            self.install(data)
+            self._memo = {}
+            self.loaded = True
+
+    def start(self):
+        """Start the background builds once per process, unless the settings leave them to refresh()."""
+        if not getattr(settings, 'PREFIX_INDEXES', {}).get('BUILD_IN_BACKGROUND', True):
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self.refresh()
+                logger.info("Built the %s in %.2fs.", self.name, time.monotonic() - started)
+            except Exception:
+                logger.exception("Building the %s failed.", self.name)
+            finally:
+                # Do not hold this thread's connection while sleeping
+                connections.close_all()
+            time.sleep(self.reload_seconds)
+
+    def memoised(self, key, prefix, compute):
+        """compute() under the lock, memoised until the data changes for short prefixes."""
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+            result = compute()
+            if len(prefix) <= MEMO_PREFIX_LENGTH:
+                self._memo[key] = result
+            return result
@@ -0,0 +1,63 @@
+"""
+Rating summaries of the catalog entities.
+
+Each reviewed entity has one RatingSummary row (count, total and a 1-5
+histogram), updated in place with F() expressions whenever a Review is
+created, changed or deleted, so the catalog lists read the average rating
+and review count through a subquery instead of aggregating the reviews.
+"""
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import RatingSummary, Review
+
+# Review.entity_type values that differ from the catalog entity types
+REVIEW_ENTITY_ALIASES = {'archaeological_sites': 'archaeological_site'}
+
+
+def normalize_entity_type(entity_type):
+    return REVIEW_ENTITY_ALIASES.get(entity_type, entity_type)
+
+
+def apply(entity_type, entity_id, rating, delta):
+    """Add (delta=1) or remove (delta=-1) one rating from the entity's summary."""
+    entity_type = normalize_entity_type(entity_type)
+    histogram = f'rating_{rating}'
+    with transaction.atomic():
+        if delta > 0:
+            RatingSummary.objects.bulk_create(
+                [RatingSummary(entity_type=entity_type, entity_id=entity_id)], ignore_conflicts=True
+            )
+        RatingSummary.objects.filter(entity_type=entity_type, entity_id=entity_id).update(
+            count=F('count') + delta,
+            total=F('total') + delta * rating,
+            **{histogram: F(histogram) + delta},
+        )
+
+
+def rebuild():
+    """Recompute every summary from the reviews. Returns the number of summaries."""
+    summaries = {}
+    for entity_type, entity_id, rating in Review.objects.values_list('entity_type', 'entity_id', 'rating').iterator():
+        key = (normalize_entity_type(entity_type), entity_id)
+        summary = summaries.get(key)
+        if summary is None:
+            summary = summaries[key] = RatingSummary(entity_type=key[0], entity_id=entity_id)
+        summary.count += 1
+        summary.total += rating
+        setattr(summary, f'rating_{rating}', getattr(summary, f'rating_{rating}') + 1)
+
+    with transaction.atomic():
+        RatingSummary.objects.all().delete()
+        RatingSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+    return len(summaries)
+
+
+def annotate_ratings(queryset, entity_type):
+    """Annotate catalog rows with `rating_count` and `rating_total` from their summary, in the same query."""
+    summaries = RatingSummary.objects.filter(entity_type=entity_type, entity_id=OuterRef('pk'))
+    return queryset.annotate(
+        rating_count=Coalesce(Subquery(summaries.values('count')[:1]), Value(0), output_field=IntegerField()),
+        rating_total=Subquery(summaries.values('total')[:1], output_field=IntegerField()),
+    )
@@ -0,0 +1,156 @@
+"""
+Catalog search over an inverted index of names and descriptions.
+
+Each catalog row is split into normalized terms (lowercase, accents stripped)
+stored in the SearchTerm table with a weight: name terms count more than
+description terms. A query matches the entities having, for every query word,
+a term starting with it, ranked by the summed weights. The index is a plain
+table with B-tree indexes, so it works the same on PostgreSQL and SQLite.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Max, OuterRef, Q, Subquery, Sum, Value, When
+
+from .models import CATALOG_ENTITY_TYPES, CATALOG_MODELS, SearchTerm
+
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+# A query word that only prefixes a term scores less than an exact term
+PREFIX_FACTOR = 0.5
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+# Most ranked hits kept for one query across all types (the per-type ?search= is not capped)
+MAX_RESULTS = 500
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Lowercase and strip accents so "Musée" and "musee" index the same."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return [t[:MAX_TERM_LENGTH] for t in TOKEN_RE.findall(normalize(text)) if len(t) >= MIN_TERM_LENGTH]
+
+
+def document_terms(name, description):
+    """Return {term: weight} for one catalog row."""
+    weights = defaultdict(float)
+    for term in tokenize(name):
+        weights[term] += NAME_WEIGHT
+    for term in tokenize(description):
+        weights[term] += DESCRIPTION_WEIGHT
+    return weights
+
+
+def index_instances(entity_type, instances):
+    """(Re)index a batch of rows of one type with one delete and one insert."""
+    instances = list(instances)
+    terms = [
+        SearchTerm(entity_type=entity_type, entity_id=obj.pk, term=term, weight=weight)
+        for obj in instances
+        for term, weight in document_terms(obj.name, obj.description).items()
+    ]
+    with transaction.atomic():
+        SearchTerm.objects.filter(entity_type=entity_type, entity_id__in=[obj.pk for obj in instances]).delete()
+        SearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+def index_instance(instance):
+    index_instances(CATALOG_ENTITY_TYPES[type(instance)], [instance])
+
+
+def remove_instance(instance):
+    SearchTerm.objects.filter(entity_type=CATALOG_ENTITY_TYPES[type(instance)], entity_id=instance.pk).delete()
+
+
+def rebuild(entity_types=None, batch_size=1000):
+    """Rebuild the index of the given entity types (all by default). Returns the number of rows indexed."""
+    count = 0
+    for entity_type in entity_types or CATALOG_MODELS:
+        model = CATALOG_MODELS[entity_type]
+        SearchTerm.objects.filter(entity_type=entity_type).delete()
+        batch = []
+        for obj in model.objects.only('pk', 'name', 'description').iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) == batch_size:
+                index_instances(entity_type, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            index_instances(entity_type, batch)
+            count += len(batch)
+    return count
+
+
+def scored_entities(query, entity_types=None):
+    """
+    Values queryset of (entity_type, entity_id, score) for the entities matching
+    every word of `query`, scored and filtered in SQL (GROUP BY ... HAVING), or
+    None when the query has no words. Restricted to the given entity types.
+    """
+    words = list(dict.fromkeys(tokenize(query)))
+    if not words:
+        return None
+
+    matches = Q()
+    for word in words:
+        matches |= Q(term__startswith=word)
+    rows = SearchTerm.objects.filter(matches)
+    if entity_types:
+        rows = rows.filter(entity_type__in=entity_types)
+
+    # Every word must prefix one of the entity's terms
+    matched = {
+        f'matched_{i}': Max(Case(When(term__startswith=word, then=Value(1)), default=Value(0)))
+        for i, word in enumerate(words)
+    }
+    # Each term scores for every word prefixing it, fully when it is the word itself
+    score = Sum(sum(
+        (Case(
+            When(term=word, then=F('weight')),
+            When(term__startswith=word, then=F('weight') * PREFIX_FACTOR),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ) for word in words),
+        Value(0.0),
+    ), output_field=FloatField())
+    return (
+        rows.order_by().values('entity_type', 'entity_id')
+        .annotate(**matched).filter(**{name: 1 for name in matched})
+        .annotate(score=score)
+    )
+
+
+def rank(query, entity_types=None, limit=MAX_RESULTS):
+    """
+    Return [(entity_type, entity_id, score)] for the entities matching every word
+    of `query`, best first. Restricted to the given entity types, before the limit.
+    """
+    rows = scored_entities(query, entity_types)
+    if rows is None:
+        return []
+    hits = rows.order_by('-score', 'entity_type', 'entity_id').values_list('entity_type', 'entity_id', 'score')
+    return list(hits[:limit])
+
+
+def search_queryset(queryset, entity_type, query):
+    """
+    Restrict a catalog queryset to every row matching `query`, annotated with
+    their relevance as `search_rank` and ordered by it. The ranking stays in
+    SQL, so the pagination slices it without a cap on the matches.
+    """
+    rows = scored_entities(query, [entity_type])
+    if rows is None:
+        return queryset.none()
+    scores = rows.filter(entity_id=OuterRef('pk')).values('score')
+    return (
+        queryset.filter(pk__in=rows.values('entity_id'))
+        .annotate(search_rank=Subquery(scores, output_field=FloatField()))
+        .order_by('-search_rank', 'pk')
+    )
@@ -19,8 +19,74 @@ class CuisineSerializer(serializers.ModelSerializer):
         model = Cuisine
         fields = ['id', 'name']
 
-class HotelSerializer(serializers.ModelSerializer):
-    equipments = serializers.PrimaryKeyRelatedField(queryset=Equipment.objects.all(), many=True)
+def rating_average(obj):
+    """Average rating from the rating_count/rating_total annotations, rounded to one decimal."""
+    count = getattr(obj, 'rating_count', None)
+    total = getattr(obj, 'rating_total', None)
+    return round(total / count, 1) if count and total is not None else None
+
+
+class EquipmentListField(serializers.ManyRelatedField):
+    """
+    Equipment ids of a hotel or guest house, validated in one id__in query:
+    unknown ids and equipments not flagged for this kind of accommodation
+    (Equipment.hotel / Equipment.guest_house) are reported together.
+    """
+
+    def __init__(self, flag, label, **kwargs):
+        self.flag = flag
+        self.kind = label
+        kwargs.setdefault('child_relation', serializers.PrimaryKeyRelatedField(queryset=Equipment.objects.all()))
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in data))
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("Equipment ids must be integers.")
+
+        equipments = Equipment.objects.in_bulk(ids)
+        errors = []
+        unknown = [pk for pk in ids if pk not in equipments]
+        if unknown:
+            errors.append(f"Unknown equipments: {unknown}")
+        invalid = [pk for pk in ids if pk in equipments and not getattr(equipments[pk], self.flag)]
+        if invalid:
+            errors.append(f"Some equipments are not valid for {self.kind}: {invalid}")
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [equipments[pk] for pk in ids]
+
+
+class CatalogFieldsMixin(serializers.Serializer):
+    """Read-only fields computed by the catalog list queries (distance to ?near=, ratings, favorites)."""
+    distance_km = serializers.SerializerMethodField()
+    rating_average = serializers.SerializerMethodField()
+    rating_count = serializers.SerializerMethodField()
+    is_favorite = serializers.SerializerMethodField()
+
+    def get_distance_km(self, obj):
+        distance = getattr(obj, 'distance_km', None)
+        return round(distance, 3) if distance is not None else None
+
+    def get_rating_average(self, obj):
+        return rating_average(obj)
+
+    def get_rating_count(self, obj):
+        return getattr(obj, 'rating_count', None)
+
+    def get_is_favorite(self, obj):
+        # The viewset loads the user's favorites among the page (CatalogQuerysetMixin)
+        favorite_ids = self.context.get('favorite_ids')
+        return obj.pk in favorite_ids if favorite_ids is not None else None
+
+
+class HotelSerializer(CatalogFieldsMixin, serializers.ModelSerializer):
+    equipments = EquipmentListField(flag='hotel', label='hotels')
 
     name = serializers.CharField(
         max_length=255,
@@ -49,15 +115,6 @@ class HotelSerializer(serializers.ModelSerializer):
         model = Hotel
         fields = '__all__'  # Include all fields
 
-    def validate_equipments(self, value):
-        """
-        Only allow equipments where hotel=True.
-        """
-        invalid = [eq for eq in value if not eq.hotel]
-        if invalid:
-            raise serializers.ValidationError(f"Some equipments are not valid for hotels: {[e.id for e in invalid]}")
-        return value
-
     def validate_name(self, value):
         """Custom validation for hotel name."""
         if len(value) < 3:
@@ -77,46 +134,38 @@ class HotelSerializer(serializers.ModelSerializer):
         return value
     
     def create(self, validated_data):
-        equipments_data = validated_data.pop('equipments', [])
+        equipments = validated_data.pop('equipments', [])
         hotel = Hotel.objects.create(**validated_data)
-        
-        # Add equipment to the guest house
-        for equipment in equipments_data:
-            hotel.equipments.add(equipment)
-
+        hotel.equipments.set(equipments)  # Single insert of the links
         return hotel
 
     def update(self, instance, validated_data):
-        equipments_data = validated_data.pop('equipments', [])
+        equipments = validated_data.pop('equipments', None)
         instance = super().update(instance, validated_data)
 
-        # Clear current equipment assignments and add new ones
-        instance.equipments.clear()
-        for equipment_data in equipments_data:
-            equipment = Equipment.objects.get(id=equipment_data['id'])  # Get the equipment by ID
-            instance.equipments.add(equipment)
-
-        instance.save()
+        # Only the difference with the current links is written
+        if equipments is not None:
+            instance.equipments.set(equipments)
         return instance
 
 
         
 
 
-class RestaurantSerializer(serializers.ModelSerializer):
+class RestaurantSerializer(CatalogFieldsMixin, serializers.ModelSerializer):
     destination = DestinationSerializer()
     class Meta:
         model = Restaurant
         fields = '__all__'
 
 
-class ActivitySerializer(serializers.ModelSerializer):
+class ActivitySerializer(CatalogFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Activity
         fields = '__all__'
 
 
-class MuseumSerializer(serializers.ModelSerializer):
+class MuseumSerializer(CatalogFieldsMixin, serializers.ModelSerializer):
     # Custom validation for latitude and longitude
     def validate_latitude(self, value):
         if value < -90 or value > 90:
@@ -155,12 +204,12 @@ class MuseumSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ArchaeologicalSiteSerializer(serializers.ModelSerializer):
+class ArchaeologicalSiteSerializer(CatalogFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ArchaeologicalSite
         fields = '__all__'
 
-class FestivalSerializer(serializers.ModelSerializer):
+class FestivalSerializer(CatalogFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Festival
         fields = '__all__'
@@ -171,18 +220,8 @@ class EquipmentSerializer(serializers.ModelSerializer):
         fields = '__all__' # Customize fields as per your model
 
 
-class GuestHouseSerializer(serializers.ModelSerializer):
-    equipments = serializers.PrimaryKeyRelatedField(queryset=Equipment.objects.all(), many=True)
-
-    def validate_equipments(self, value):
-        """
-        Only allow equipments where guest_house=True.
-        """
-        invalid = [eq for eq in value if not eq.guest_house]
-        if invalid:
-            raise serializers.ValidationError(f"Some equipments are not valid for guest houses: {[e.id for e in invalid]}")
-        return value
-
+class GuestHouseSerializer(CatalogFieldsMixin, serializers.ModelSerializer):
+    equipments = EquipmentListField(flag='guest_house', label='guest houses')
 
     # Custom validation for latitude and longitude
     def validate_latitude(self, value):
@@ -223,26 +262,18 @@ class GuestHouseSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def create(self, validated_data):
-        equipments_data = validated_data.pop('equipments', [])
+        equipments = validated_data.pop('equipments', [])
         guest_house = GuestHouse.objects.create(**validated_data)
-        
-        # Add equipment to the guest house
-        for equipment in equipments_data:
-            guest_house.equipments.add(equipment)
-
+        guest_house.equipments.set(equipments)  # Single insert of the links
         return guest_house
 
     def update(self, instance, validated_data):
-        equipments_data = validated_data.pop('equipments', [])
+        equipments = validated_data.pop('equipments', None)
         instance = super().update(instance, validated_data)
 
-        # Clear current equipment assignments and add new ones
-        instance.equipments.clear()
-        for equipment_data in equipments_data:
-            equipment = Equipment.objects.get(id=equipment_data['id'])  # Get the equipment by ID
-            instance.equipments.add(equipment)
-
-        instance.save()
+        # Only the difference with the current links is written
+        if equipments is not None:
+            instance.equipments.set(equipments)
         return instance
 
 
@@ -255,7 +286,52 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'entity_type', 'entity_id', 'user', 'rating', 'comment', 'image', 'created_at', 'updated_at']
 
 
+class CatalogCardSerializer(serializers.Serializer):
+    """
+    Compact representation shared by every catalog type (search hits, favorites, ...).
+    Expects the destination to be loaded with select_related.
+    """
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    description = serializers.CharField(allow_null=True)
+    price = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+    latitude = serializers.DecimalField(max_digits=9, decimal_places=6, allow_null=True)
+    longitude = serializers.DecimalField(max_digits=9, decimal_places=6, allow_null=True)
+    destination = serializers.SerializerMethodField()
+    rating_average = serializers.SerializerMethodField()
+    rating_count = serializers.SerializerMethodField()
+
+    def get_price(self, obj):
+        price = getattr(obj, 'price', None)
+        return str(price) if price is not None else None
+
+    def get_image(self, obj):
+        # The catalog tables do not agree on the image column name
+        for field in ('image', 'image_url', 'images'):
+            if getattr(obj, field, None):
+                return getattr(obj, field)
+        return None
+
+    def get_destination(self, obj):
+        if obj.destination_id is None:
+            return None
+        return {'id': obj.destination_id, 'name': obj.destination.name}
+
+    def get_rating_average(self, obj):
+        return rating_average(obj)
+
+    def get_rating_count(self, obj):
+        return getattr(obj, 'rating_count', None)
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
         fields = ['user', 'entity_type', 'entity_id', 'created_at', 'updated_at']
+
+
+class FavoriteEntitySerializer(serializers.Serializer):
+    """An (entity_type, entity_id) pair sent to add, remove or sync favorites."""
+    entity_type = serializers.ChoiceField(choices=Favorite.ENTITY_TYPES)
+    entity_id = serializers.IntegerField(min_value=1)
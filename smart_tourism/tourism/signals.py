@@ -0,0 +1,86 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import CATALOG_MODELS, Cuisine, Destination, Equipment, GuestHouse, Hotel, Review
+from . import caching, geocoding, ratings, search, spatial, suggest
+
+
+@receiver([post_save, post_delete], sender=Destination)
+def reset_geocoder(sender, **kwargs):
+    """Destinations are matched to governorates once, so reload them after a change."""
+    geocoding.geocoder.reset()
+
+
+@receiver(post_save, sender=Destination)
+def update_destination_suggestions(sender, instance, **kwargs):
+    suggest.update_instance(instance)
+
+
+@receiver(post_delete, sender=Destination)
+def remove_destination_suggestions(sender, instance, **kwargs):
+    suggest.remove_instance(instance)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    """Keep the stored rating of an edited review, to move it out of the old summary."""
+    instance._rating_before = None
+    if instance.pk is not None:
+        instance._rating_before = (
+            Review.objects.filter(pk=instance.pk).values_list('entity_type', 'entity_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_summary(sender, instance, created, **kwargs):
+    current = (instance.entity_type, instance.entity_id, instance.rating)
+    before = getattr(instance, '_rating_before', None)
+    if before == current:
+        return
+    if before is not None:
+        ratings.apply(*before, delta=-1)
+    ratings.apply(*current, delta=1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_from_rating_summary(sender, instance, **kwargs):
+    ratings.apply(instance.entity_type, instance.entity_id, instance.rating, delta=-1)
+
+
+def index_catalog_entity(sender, instance, **kwargs):
+    search.index_instance(instance)
+    spatial.index_instance(instance)
+    suggest.update_instance(instance)
+
+
+def unindex_catalog_entity(sender, instance, **kwargs):
+    search.remove_instance(instance)
+    spatial.remove_instance(instance)
+    suggest.remove_instance(instance)
+
+
+for model in CATALOG_MODELS.values():
+    post_save.connect(index_catalog_entity, sender=model, dispatch_uid=f'search_index_{model.__name__}')
+    post_delete.connect(unindex_catalog_entity, sender=model, dispatch_uid=f'search_unindex_{model.__name__}')
+
+
+# Models whose changes show in the cached anonymous catalog responses
+CACHED_MODELS = [*CATALOG_MODELS.values(), Destination, Review, Equipment, Cuisine]
+
+
+def bump_response_generation(sender, **kwargs):
+    caching.bump(sender)
+
+
+def bump_equipment_owner_generation(sender, instance, action, **kwargs):
+    if action.startswith('post_'):
+        caching.bump(type(instance) if not kwargs.get('reverse') else kwargs['model'])
+
+
+for model in CACHED_MODELS:
+    post_save.connect(bump_response_generation, sender=model, dispatch_uid=f'response_cache_{model.__name__}')
+    post_delete.connect(bump_response_generation, sender=model, dispatch_uid=f'response_cache_delete_{model.__name__}')
+
+for model in (Hotel, GuestHouse):
+    m2m_changed.connect(bump_equipment_owner_generation, sender=model.equipments.through,
+                        dispatch_uid=f'response_cache_equipments_{model.__name__}')
@@ -0,0 +1,265 @@
+"""
+Spatial queries over the catalog coordinates.
+
+Every located catalog row has a GeoPoint holding its geohash. A "near" query
+first turns its radius into a bounding box, covers the box with a handful of
+geohash cells and selects only the points in those cells (a prefix range scan
+on an index), in a subquery of the catalog query, which then keeps the rows
+within the exact great-circle distance.
+
+Map viewports are clustered the same way: points are grouped in SQL by a
+geohash prefix whose length follows the zoom level, and the clustered grid is
+cached until the index changes: the cache keys carry the shared GeoPoint
+generation counter (tourism.caching), so a change on one worker retires the
+grids cached by the others.
+"""
+import math
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, Min, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt, Substr
+
+from . import caching
+from .models import CATALOG_ENTITY_TYPES, CATALOG_MODELS, GeoPoint
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9  # ~5 m cells
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Most geohash cells a bounding box may be covered with
+MAX_COVERING_CELLS = 16
+MAX_RADIUS_KM = 500
+
+# Geohash precision of the map clusters by zoom level (None: no clustering)
+CLUSTER_PRECISION_BY_ZOOM = [
+    (4, 2), (6, 3), (8, 4), (10, 5), (13, 6), (15, 7),
+]
+MAP_CACHE_TIMEOUT = 10 * 60
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points, in kilometres."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def haversine_expression(lat, lon, latitude='latitude', longitude='longitude'):
+    """SQL expression of the distance in km from (lat, lon) to the row's coordinates."""
+    # The catalog stores decimals; compute in floating point
+    row_lat = Radians(Cast(F(latitude), FloatField()))
+    row_lon = Radians(Cast(F(longitude), FloatField()))
+    d_lat = row_lat - math.radians(lat)
+    d_lon = row_lon - math.radians(lon)
+    a = Power(Sin(d_lat / 2), 2) + math.cos(math.radians(lat)) * Cos(row_lat) * Power(Sin(d_lon / 2), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def encode_geohash(lat, lon, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, bit_count, even = [], 0, 0, True
+    while len(geohash) < precision:
+        interval, value = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(geohash)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell of the given precision."""
+    bits = 5 * precision
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, min_lon, max_lat, max_lon) enclosing the circle."""
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    d_lon = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return max(lat - d_lat, -90.0), max(lon - d_lon, -180.0), min(lat + d_lat, 90.0), min(lon + d_lon, 180.0)
+
+
+def _steps(low, high, step):
+    value = low
+    while value < high:
+        yield value
+        value += step
+    yield high
+
+
+def covering_cells(min_lat, min_lon, max_lat, max_lon):
+    """Geohash prefixes covering the box, at the finest precision needing at most MAX_COVERING_CELLS cells."""
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(candidate)
+        rows = math.ceil((max_lat - min_lat) / height) + 1
+        cols = math.ceil((max_lon - min_lon) / width) + 1
+        if rows * cols <= MAX_COVERING_CELLS:
+            precision = candidate
+            break
+
+    height, width = cell_size(precision)
+    # Sample points closer than one cell apart, so every cell the box touches gets one
+    return {
+        encode_geohash(lat, lon, precision)
+        for lat in _steps(min_lat, max_lat, height)
+        for lon in _steps(min_lon, max_lon, width)
+    }
+
+
+def index_instances(entity_type, instances):
+    """(Re)index the coordinates of a batch of rows of one type."""
+    instances = list(instances)
+    points = [
+        GeoPoint(
+            entity_type=entity_type,
+            entity_id=obj.pk,
+            geohash=encode_geohash(float(obj.latitude), float(obj.longitude)),
+            latitude=float(obj.latitude),
+            longitude=float(obj.longitude),
+        )
+        for obj in instances
+        if obj.latitude is not None and obj.longitude is not None
+    ]
+    with transaction.atomic():
+        GeoPoint.objects.filter(entity_type=entity_type, entity_id__in=[obj.pk for obj in instances]).delete()
+        GeoPoint.objects.bulk_create(points, batch_size=1000)
+    bump_generation()
+
+
+def index_instance(instance):
+    index_instances(CATALOG_ENTITY_TYPES[type(instance)], [instance])
+
+
+def remove_instance(instance):
+    GeoPoint.objects.filter(entity_type=CATALOG_ENTITY_TYPES[type(instance)], entity_id=instance.pk).delete()
+    bump_generation()
+
+
+def generation():
+    """Version of the geohash index, part of the map cache keys."""
+    return caching.generations([GeoPoint])[0]
+
+
+def bump_generation():
+    caching.bump(GeoPoint)
+
+
+def rebuild(entity_types=None, batch_size=1000):
+    """Rebuild the geohash index of the given entity types (all by default). Returns the number of rows seen."""
+    count = 0
+    for entity_type in entity_types or CATALOG_MODELS:
+        model = CATALOG_MODELS[entity_type]
+        GeoPoint.objects.filter(entity_type=entity_type).delete()
+        batch = []
+        for obj in model.objects.only('pk', 'latitude', 'longitude').iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) == batch_size:
+                index_instances(entity_type, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            index_instances(entity_type, batch)
+            count += len(batch)
+    return count
+
+
+def points_in_box(min_lat, min_lon, max_lat, max_lon, entity_type=None):
+    """GeoPoint queryset of the points inside the box, fetched through the covering geohash cells."""
+    cells = Q()
+    for prefix in covering_cells(min_lat, min_lon, max_lat, max_lon):
+        cells |= Q(geohash__startswith=prefix)
+    points = GeoPoint.objects.filter(cells).filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lon, max_lon),
+    )
+    if entity_type:
+        points = points.filter(entity_type=entity_type)
+    return points
+
+
+def near_queryset(queryset, entity_type, lat, lon, radius_km):
+    """
+    Restrict a catalog queryset to the rows within radius_km of (lat, lon),
+    annotated with `distance_km` and ordered nearest first. The geohash cells
+    of the radius' bounding box narrow the rows down in a subquery, so the
+    exact distance is only computed for the rows in the box.
+    """
+    points = points_in_box(*bounding_box(lat, lon, radius_km), entity_type=entity_type)
+    return (
+        queryset.filter(pk__in=points.values('entity_id'))
+        .annotate(distance_km=haversine_expression(lat, lon))
+        .filter(distance_km__lte=radius_km)
+        .order_by('distance_km', 'pk')
+    )
+
+
+def cluster_precision(zoom):
+    for max_zoom, precision in CLUSTER_PRECISION_BY_ZOOM:
+        if zoom <= max_zoom:
+            return precision
+    return None
+
+
+def snap_to_grid(min_lat, min_lon, max_lat, max_lon, precision):
+    """Grow the box to whole cells, so neighbouring viewports share clusters and cache entries."""
+    height, width = cell_size(precision)
+    return (
+        max(math.floor(min_lat / height) * height, -90.0),
+        max(math.floor(min_lon / width) * width, -180.0),
+        min(math.ceil(max_lat / height) * height, 90.0),
+        min(math.ceil(max_lon / width) * width, 180.0),
+    )
+
+
+def map_clusters(min_lat, min_lon, max_lat, max_lon, zoom, entity_types):
+    """
+    Return {entity_type: [[lat, lon, count, entity_id], ...]} for the viewport.
+    Each tuple is a cluster at its points' mean position; entity_id is set when
+    the cluster is a single point. Past the last clustered zoom level every
+    point is returned on its own.
+    """
+    precision = cluster_precision(zoom)
+    if precision is not None:
+        min_lat, min_lon, max_lat, max_lon = snap_to_grid(min_lat, min_lon, max_lat, max_lon, precision)
+
+    key = 'tourism:map:%s:%s:%s' % (
+        generation(), precision, ':'.join(['%.6f' % v for v in (min_lat, min_lon, max_lat, max_lon)] + sorted(entity_types))
+    )
+    clusters = cache.get(key)
+    if clusters is not None:
+        return clusters
+
+    points = points_in_box(min_lat, min_lon, max_lat, max_lon).filter(entity_type__in=entity_types)
+    clusters = {entity_type: [] for entity_type in entity_types}
+    if precision is None:
+        rows = points.values_list('entity_type', 'latitude', 'longitude', 'entity_id')
+        for entity_type, lat, lon, entity_id in rows:
+            clusters[entity_type].append([round(lat, 5), round(lon, 5), 1, entity_id])
+    else:
+        rows = (
+            points.annotate(cell=Substr('geohash', 1, precision))
+            .values('entity_type', 'cell')
+            .annotate(count=Count('id'), lat=Avg('latitude'), lon=Avg('longitude'), entity_id=Min('entity_id'))
+            .order_by()
+        )
+        for row in rows:
+            clusters[row['entity_type']].append([
+                round(row['lat'], 5), round(row['lon'], 5), row['count'],
+                row['entity_id'] if row['count'] == 1 else None,
+            ])
+
+    cache.set(key, clusters, MAP_CACHE_TIMEOUT)
+    return clusters
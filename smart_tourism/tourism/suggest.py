@@ -0,0 +1,124 @@
+"""
+Typeahead over the names of the catalog entities and destinations.
+
+Every word of every name is kept, accent-stripped and lowercased, in one
+sorted in-memory list of (word, entity_type, entity_id): the names matching a
+prefix are a bisect range, so suggestions never touch the database. The list
+is built in the background (tourism.prefixes) from the first request the
+process serves, kept up to date by the save/delete signals of this process and
+rebuilt every RELOAD_SECONDS for the changes made elsewhere (other workers,
+import_catalog).
+"""
+import heapq
+from bisect import bisect_left, insort
+from operator import itemgetter
+
+from .models import CATALOG_ENTITY_TYPES, Destination
+from .prefixes import PrefixIndex, prefix_range
+from .search import TOKEN_RE, normalize
+
+ENTITY_TYPES = {Destination: 'destination', **CATALOG_ENTITY_TYPES}
+MAX_LIMIT = 20
+RELOAD_SECONDS = 15 * 60
+
+
+def words(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+class NamePrefixIndex(PrefixIndex):
+    name = 'typeahead index'
+
+    def __init__(self, reload_seconds=RELOAD_SECONDS):
+        super().__init__(reload_seconds)
+        self._words = []  # sorted (word, entity_type, entity_id)
+        self._names = {}  # (entity_type, entity_id) -> (name, normalized words)
+
+    def build(self):
+        names = {}
+        for model, entity_type in ENTITY_TYPES.items():
+            for pk, name in model.objects.values_list('pk', 'name').iterator():
+                if name:
+                    names[(entity_type, pk)] = (name, tuple(words(name)))
+        entries = sorted(
+            (word, entity_type, pk)
+            for (entity_type, pk), (_, name_words) in names.items()
+            for word in set(name_words)
+        )
+        return names, entries
+
+    def install(self, data):
+        self._names, self._words = data
+
+    def _remove(self, key):
+        _, name_words = self._names.pop(key)
+        for word in set(name_words):
+            position = bisect_left(self._words, (word, *key))
+            if position < len(self._words) and self._words[position] == (word, *key):
+                del self._words[position]
+
+    def update(self, entity_type, entity_id, name):
+        if not self.loaded:
+            return  # The coming build reads it
+        key = (entity_type, entity_id)
+        with self._lock:
+            if key in self._names:
+                self._remove(key)
+            if name:
+                name_words = tuple(words(name))
+                self._names[key] = (name, name_words)
+                for word in set(name_words):
+                    insort(self._words, (word, *key))
+            self._memo = {}
+
+    def remove(self, entity_type, entity_id):
+        if not self.loaded:
+            return
+        with self._lock:
+            if (entity_type, entity_id) in self._names:
+                self._remove((entity_type, entity_id))
+            self._memo = {}
+
+    def suggest(self, prefix, limit=10, entity_types=None):
+        """
+        Return [(entity_type, entity_id, name)] whose name has a word starting
+        with every word of the prefix; names starting with the prefix come
+        first, then shorter names.
+        """
+        tokens = words(prefix)
+        if not tokens:
+            return []
+        self.start()
+        memo_key = (tuple(tokens), limit, entity_types and tuple(sorted(entity_types)))
+        return self.memoised(memo_key, ' '.join(tokens), lambda: self._match(tokens, limit, entity_types))
+
+    def _match(self, tokens, limit, entity_types):
+        # Scan the range of the longest word, the most selective one
+        anchor = max(tokens, key=len)
+        others = [token for token in tokens if token is not anchor]
+        low, high = prefix_range(self._words, anchor, key=itemgetter(0))
+        candidates = set()
+        for position in range(low, high):
+            _, entity_type, entity_id = self._words[position]
+            if not entity_types or entity_type in entity_types:
+                candidates.add((entity_type, entity_id))
+
+        phrase = ' '.join(tokens)
+        matches = []
+        for key in candidates:
+            name, name_words = self._names[key]
+            if all(any(word.startswith(token) for word in name_words) for token in others):
+                rank = (not ' '.join(name_words).startswith(phrase), len(name), name)
+                matches.append((rank, key, name))
+        return [(key[0], key[1], name) for _, key, name in heapq.nsmallest(limit, matches)]
+
+
+index = NamePrefixIndex()
+
+
+def update_instance(instance):
+    index.update(ENTITY_TYPES[type(instance)], instance.pk, instance.name)
+
+
+def remove_instance(instance):
+    index.remove(ENTITY_TYPES[type(instance)], instance.pk)
@@ -1,3 +1,494 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import NotFound
+from rest_framework.test import APIClient
+
+from itinerary.models import Circuit, CircuitSchedule
+from users.models import CustomUser
+
+from . import caching, geocoding, spatial, suggest
+from .models import CATALOG_MODELS, Cuisine, Destination, Equipment, Favorite, GeoPoint, Hotel, Restaurant
+from .pagination import CatalogPagination, KeysetPagination
+from .suggest import NamePrefixIndex
 
 # Create your tests here.
+
+# Unmanaged tables behind the catalog, in creation order. The circuit tables are
+# among them: saving a catalog row looks up the circuits scheduling it (itinerary.signals)
+CATALOG_TABLES = (Equipment, Cuisine, Destination, *CATALOG_MODELS.values(), Circuit, CircuitSchedule)
+
+# Every cache alias in local memory, so the tests never touch the shared ones
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-{alias}'}
+    for alias in settings.CACHES
+}
+
+
+class UnmanagedTablesMixin:
+    """
+    TestCase mixin creating the tables of unmanaged models for the test class:
+    the migrations leave them to the production schema, so the test database
+    does not have them.
+    """
+    unmanaged_models = ()
+
+    @classmethod
+    def setUpClass(cls):
+        existing = set(connection.introspection.table_names())
+        cls._created_models = [model for model in cls.unmanaged_models if model._meta.db_table not in existing]
+        # Outside the class transaction: the SQLite schema editor refuses to run inside one
+        with connection.schema_editor() as schema_editor:
+            for model in cls._created_models:
+                schema_editor.create_model(model)
+                # create_model() leaves out the Meta.indexes of unmanaged models
+                for index in model._meta.indexes:
+                    schema_editor.add_index(model, index)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as schema_editor:
+            for model in reversed(cls._created_models):
+                schema_editor.delete_model(model)
+
+
+class ListQueryCountMixin:
+    """
+    TestCase mixin checking that a list endpoint loads its relations in bulk:
+    the number of queries must not grow with the number of rows returned.
+    """
+
+    def assertConstantListQueries(self, url, add_rows, sizes=(1, 5, 20), params=None):
+        """
+        Grow the table to each of `sizes` rows with `add_rows(count)` and request
+        `url` with a page as large as the table every time.
+        """
+        counts = {}
+        total = 0
+        for size in sizes:
+            # The generation counters are bumped on commit, as they would be outside the test transaction
+            with self.captureOnCommitCallbacks(execute=True):
+                add_rows(size - total)
+            total = size
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, {**(params or {}), 'page_size': size})
+            self.assertEqual(response.status_code, 200)
+            counts[size] = len(context.captured_queries)
+        self.assertEqual(len(set(counts.values())), 1, f"Query count grows with the rows returned: {counts}")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CatalogTestCase(UnmanagedTablesMixin, TestCase):
+    """Catalog tables created for the class, caches emptied before each test."""
+    unmanaged_models = CATALOG_TABLES
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+
+class CatalogListQueryTests(ListQueryCountMixin, CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.destinations = [
+            Destination.objects.create(name='Sousse', latitude=35.8256, longitude=10.6084),
+            Destination.objects.create(name='Djerba', latitude=33.8076, longitude=10.8451),
+        ]
+
+    def test_hotel_list(self):
+        equipments = [
+            Equipment.objects.create(name='Piscine', category='Loisirs', hotel=True),
+            Equipment.objects.create(name='Wifi', category='Services', hotel=True),
+        ]
+
+        def add_hotels(count):
+            for _ in range(count):
+                number = Hotel.objects.count() + 1
+                hotel = Hotel.objects.create(
+                    name=f'Hotel {number}', stars=number % 5 + 1, price=50 + number,
+                    destination=self.destinations[number % 2],
+                )
+                hotel.equipments.set(equipments)
+
+        self.assertConstantListQueries('/api/tourism/hotels/', add_hotels)
+
+    def test_restaurant_list(self):
+        cuisines = [Cuisine.objects.create(name='Tunisienne'), Cuisine.objects.create(name='Italienne')]
+
+        def add_restaurants(count):
+            for _ in range(count):
+                number = Restaurant.objects.count() + 1
+                Restaurant.objects.create(
+                    name=f'Restaurant {number}', forks=number % 3 + 1, price=10 + number,
+                    destination=self.destinations[number % 2], cuisine=cuisines[number % 2],
+                )
+
+        self.assertConstantListQueries('/api/tourism/restaurants/', add_restaurants)
+
+
+class KeysetCursorTests(SimpleTestCase):
+    def setUp(self):
+        self.paginator = KeysetPagination()
+
+    def round_trip(self, value, pk, field):
+        return self.paginator.decode_cursor(self.paginator.encode_cursor(value, pk), Hotel, field)
+
+    def test_round_trip(self):
+        self.assertEqual(self.round_trip(Decimal('120.50'), 7, 'price'), (Decimal('120.50'), 7))
+        self.assertEqual(self.round_trip(None, 3, 'price'), (None, 3))
+        created_at = datetime(2026, 5, 1, 9, 30, tzinfo=timezone.utc)
+        self.assertEqual(self.round_trip(created_at, 12, 'created_at'), (created_at, 12))
+        # Not a model field: an annotation such as the search rank
+        self.assertEqual(self.round_trip(0.75, 4, 'search_rank'), (0.75, 4))
+
+    def test_tampered_cursor(self):
+        def encode(data):
+            return base64.urlsafe_b64encode(data.encode()).decode()
+
+        cursors = [
+            'not a cursor!',
+            encode('not json'),
+            encode('[1, 2]'),
+            encode(json.dumps({'v': '10'})),
+            encode(json.dumps({'v': '10', 'id': 'abc'})),
+            encode(json.dumps({'v': 'cheap', 'id': 1})),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.paginator.decode_cursor(cursor, Hotel, 'price')
+
+
+class CatalogPaginationTests(CatalogTestCase):
+    url = '/api/tourism/hotels/'
+
+    def setUp(self):
+        super().setUp()
+        destination = Destination.objects.create(name='Sousse', latitude=35.8256, longitude=10.6084)
+        prices = [90, 50, None, 50, 70, 50, None, 50, 90, 50]
+        self.hotels = [
+            Hotel.objects.create(name=f'Hotel {number}', stars=3, price=price, destination=destination)
+            for number, price in enumerate(prices, 1)
+        ]
+
+    def test_cursor_pages(self):
+        ids, url, params = [], self.url, {'pagination': 'cursor', 'page_size': 3}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [hotel['id'] for hotel in response.json()['results']]
+            url, params = response.json()['next'], None
+
+        self.assertEqual(sorted(ids), sorted(hotel.pk for hotel in self.hotels))
+        # Each price in order, ties by id, NULL prices last
+        expected = sorted(self.hotels, key=lambda hotel: (hotel.price is None, hotel.price or 0, hotel.pk))
+        self.assertEqual(ids, [hotel.pk for hotel in expected])
+
+    def test_page_numbers_with_equal_prices(self):
+        for direction in ('asc', 'desc'):
+            with self.subTest(direction=direction):
+                ids, page = [], 1
+                while page:
+                    response = self.client.get(self.url, {'sort_direction': direction, 'page_size': 3, 'page': page})
+                    self.assertEqual(response.status_code, 200)
+                    ids += [hotel['id'] for hotel in response.json()['results']]
+                    page = page + 1 if response.json()['next'] else None
+                self.assertEqual(sorted(ids), sorted(hotel.pk for hotel in self.hotels))
+                # Equal prices come by id whichever the direction
+                prices = {hotel.pk: hotel.price for hotel in self.hotels}
+                for previous, current in zip(ids, ids[1:]):
+                    if prices[previous] == prices[current]:
+                        self.assertLess(previous, current)
+
+    def test_page_ordering_ends_with_the_pk(self):
+        paginator = CatalogPagination()
+        cases = [
+            (Hotel.objects.all(), ('pk',)),
+            (Hotel.objects.order_by('price'), ('price', 'pk')),
+            (Hotel.objects.order_by('-price'), ('-price', 'pk')),
+            (Hotel.objects.order_by('-price', '-id'), ('-price', '-id')),
+        ]
+        for queryset, ordering in cases:
+            with self.subTest(ordering=ordering):
+                self.assertEqual(paginator.with_tiebreaker(queryset).query.order_by, ordering)
+
+    def test_tampered_cursor_is_not_found(self):
+        response = self.client.get(self.url, {'cursor': 'not a cursor!'})
+        self.assertEqual(response.status_code, 404)
+
+
+class TypeaheadIndexTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        sousse = Destination.objects.create(name='Sousse', latitude=35.8256, longitude=10.6084)
+        self.hotel = Hotel.objects.create(name='Hotel Marhaba', stars=4, price=120, destination=sousse)
+        self.restaurant = Restaurant.objects.create(name='Marina Grill', forks=2, price=30, destination=sousse)
+
+    def test_refresh_builds_the_index(self):
+        index = NamePrefixIndex()
+        index.refresh()
+        self.assertEqual(
+            index.suggest('mar'),
+            [('restaurant', self.restaurant.pk, 'Marina Grill'), ('hotel', self.hotel.pk, 'Hotel Marhaba')],
+        )
+        self.assertEqual(index.suggest('hotel mar', entity_types=['restaurant']), [])
+
+    def test_requests_start_no_build_thread_under_tests(self):
+        response = self.client.get('/api/tourism/suggest/', {'prefix': 'mar'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(suggest.index._thread)
+
+
+def square(min_lon, min_lat, max_lon, max_lat):
+    return [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+
+
+# Simplified boundaries: Monastir has a hole, Mahdia is made of two parts
+GOVERNORATES_GEOJSON = {
+    'type': 'FeatureCollection',
+    'features': [
+        {'type': 'Feature', 'properties': {'name': 'Gouvernorat de Sousse'},
+         'geometry': {'type': 'Polygon', 'coordinates': [square(10.2, 35.7, 10.75, 36.2)]}},
+        {'type': 'Feature', 'properties': {'shapeName': 'Gouvernorat de Monastir'},
+         'geometry': {'type': 'Polygon', 'coordinates': [square(10.75, 35.5, 11.1, 35.85), square(10.9, 35.6, 11.0, 35.7)]}},
+        {'type': 'Feature', 'properties': {'NAME_1': 'Mahdia'},
+         'geometry': {'type': 'MultiPolygon', 'coordinates': [
+             [square(10.6, 35.1, 11.1, 35.5)], [square(11.2, 35.2, 11.3, 35.3)],
+         ]}},
+        {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Polygon', 'coordinates': [square(0, 0, 1, 1)]}},
+    ],
+}
+
+
+class NormalizeNameTests(SimpleTestCase):
+    def test_normalize_name(self):
+        cases = {
+            'Gouvernorat de Sousse': 'sousse',
+            "Gouvernorat d'Ariana": 'ariana',
+            'Gouvernorat d’Ariana': 'ariana',
+            'Gouvernorat du Kef': 'kef',
+            'gouvernorat Sfax': 'sfax',
+            'Béja': 'beja',
+            'Sidi-Bouzid': 'sidi bouzid',
+            # The prefix only counts at the start
+            'Grand Gouvernorat de Tunis': 'grand gouvernorat de tunis',
+        }
+        for name, normalized in cases.items():
+            with self.subTest(name=name):
+                self.assertEqual(geocoding.normalize_name(name), normalized)
+
+
+class GovernorateIndexTests(SimpleTestCase):
+    def setUp(self):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.geojson', delete=False)
+        with handle:
+            json.dump(GOVERNORATES_GEOJSON, handle)
+        self.addCleanup(os.remove, handle.name)
+        self.path = handle.name
+
+    def test_locate(self):
+        index = geocoding.GovernorateIndex.from_geojson(self.path)
+        # The feature without a name is left out
+        self.assertEqual(len(index.governorates), 3)
+        cases = [
+            ((35.8256, 10.6084), 'Gouvernorat de Sousse'),
+            ((35.7643, 10.8113), 'Gouvernorat de Monastir'),
+            ((35.65, 10.95), None),  # In the hole
+            ((35.3, 10.9), 'Mahdia'),
+            ((35.25, 11.25), 'Mahdia'),  # Second part
+            ((36.8065, 10.1815), None),
+        ]
+        for (lat, lon), name in cases:
+            with self.subTest(lat=lat, lon=lon):
+                governorate = index.locate(lat, lon)
+                self.assertEqual(governorate and governorate.name, name)
+
+
+class OfflineGeocoderTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        handle = tempfile.NamedTemporaryFile('w', suffix='.geojson', delete=False)
+        with handle:
+            json.dump(GOVERNORATES_GEOJSON, handle)
+        self.addCleanup(os.remove, handle.name)
+        self.path = handle.name
+        self.sousse = Destination.objects.create(name='Sousse', latitude=35.8256, longitude=10.6084)
+        self.monastir = Destination.objects.create(name='Monastir', latitude=35.7643, longitude=10.8113)
+        self.tunis = Destination.objects.create(name='Tunis', latitude=36.8065, longitude=10.1815)
+
+    def test_resolves_through_the_boundaries(self):
+        geocoder = geocoding.OfflineGeocoder(self.path, cache=geocoding.CoordinateCache())
+        # Inside Sousse, though closer to the Monastir centroid than to the Sousse one
+        self.assertEqual(geocoder.locate(35.72, 10.74), ('Gouvernorat de Sousse', self.sousse.pk))
+        self.assertEqual(geocoder.locate(35.6, 10.8), ('Gouvernorat de Monastir', self.monastir.pk))
+        # No destination named after the governorate
+        self.assertEqual(geocoder.locate(35.3, 10.9), ('Mahdia', None))
+        # Outside every polygon: the nearest destination
+        self.assertEqual(geocoder.locate(36.85, 10.2), ('Tunis', self.tunis.pk))
+        self.assertEqual(geocoder.locate(None, 10.2), (None, None))
+
+    def test_missing_boundaries_are_reported(self):
+        geocoder = geocoding.OfflineGeocoder(self.path + '.missing', cache=geocoding.CoordinateCache())
+        with self.assertLogs('tourism.geocoding', 'ERROR'):
+            self.assertEqual(geocoder.locate(35.6, 10.8), ('Monastir', self.monastir.pk))
+
+        with override_settings(GOVERNORATE_BOUNDARIES_PATH=self.path + '.missing'):
+            self.assertEqual([message.id for message in geocoding.check_boundaries(None)], ['tourism.W001'])
+        with override_settings(GOVERNORATE_BOUNDARIES_PATH=self.path):
+            self.assertEqual(geocoding.check_boundaries(None), [])
+
+
+class NearQuerysetTests(CatalogTestCase):
+    center = (35.8256, 10.6084)  # Sousse
+
+    def setUp(self):
+        super().setUp()
+        destination = Destination.objects.create(name='Sousse', latitude=35.8256, longitude=10.6084)
+        places = [
+            ('Hotel Mahdia', 35.5047, 11.0622),
+            ('Hotel Sousse', 35.8280, 10.6400),
+            ('Hotel Tunis', 36.8065, 10.1815),
+            ('Hotel Monastir', 35.7643, 10.8113),
+            ('Hotel Nowhere', None, None),
+        ]
+        self.hotels = {
+            name: Hotel.objects.create(
+                name=name, stars=3, price=80, latitude=lat, longitude=lon, destination=destination,
+            )
+            for name, lat, lon in places
+        }
+
+    def near(self, radius_km):
+        return list(spatial.near_queryset(Hotel.objects.all(), 'hotel', *self.center, radius_km))
+
+    def test_radius_and_distance_order(self):
+        self.assertEqual([hotel.name for hotel in self.near(20)], ['Hotel Sousse', 'Hotel Monastir'])
+        hotels = self.near(60)
+        self.assertEqual([hotel.name for hotel in hotels], ['Hotel Sousse', 'Hotel Monastir', 'Hotel Mahdia'])
+        for hotel in hotels:
+            expected = spatial.haversine_km(*self.center, float(hotel.latitude), float(hotel.longitude))
+            self.assertAlmostEqual(hotel.distance_km, expected, places=6)
+            self.assertLessEqual(hotel.distance_km, 60)
+        self.assertEqual(len(self.near(500)), 4)
+
+    def test_geohash_prefilter_is_a_subquery(self):
+        with CaptureQueriesContext(connection) as context:
+            self.near(60)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn('geo_point', context.captured_queries[0]['sql'])
+
+    def test_near_parameter(self):
+        response = self.client.get('/api/tourism/hotels/', {'near': '%s,%s' % self.center, 'radius_km': 60})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [hotel['name'] for hotel in response.json()['results']],
+            ['Hotel Sousse', 'Hotel Monastir', 'Hotel Mahdia'],
+        )
+
+
+class MapClusterGenerationTests(CatalogTestCase):
+    box = (35.0, 10.0, 37.0, 11.5)
+
+    def test_a_shared_bump_retires_the_cached_clusters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Hotel.objects.create(name='Hotel Sousse', stars=3, price=80, latitude=35.8280, longitude=10.6400)
+        generation = spatial.generation()
+        self.assertEqual(caches['catalog_generations'].get(caching.generation_key(GeoPoint)), generation)
+        self.assertEqual(len(spatial.map_clusters(*self.box, 18, ['hotel'])['hotel']), 1)
+
+        # A point indexed by another worker: only the shared counter tells this one
+        GeoPoint.objects.create(
+            entity_type='hotel', entity_id=999, geohash=spatial.encode_geohash(36.8065, 10.1815),
+            latitude=36.8065, longitude=10.1815,
+        )
+        self.assertEqual(len(spatial.map_clusters(*self.box, 18, ['hotel'])['hotel']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            caching.bump(GeoPoint)
+
+        self.assertNotEqual(spatial.generation(), generation)
+        self.assertEqual(len(spatial.map_clusters(*self.box, 18, ['hotel'])['hotel']), 2)
+
+
+class ConditionalGetTests(CatalogTestCase):
+    unmanaged_models = (*CATALOG_TABLES, CustomUser)
+    url = '/api/tourism/hotels/'
+
+    def setUp(self):
+        super().setUp()
+        sousse = Destination.objects.create(name='Sousse', latitude=35.8256, longitude=10.6084)
+        self.hotel = Hotel.objects.create(name='Hotel Marhaba', stars=4, price=120, destination=sousse)
+
+    def share_generations(self):
+        """Keep the generation counters in a file cache, as shared between workers."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = self.settings(CACHES={
+            **TEST_CACHES,
+            'catalog_generations': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name,
+            },
+        })
+        shared.enable()
+        self.addCleanup(shared.disable)
+
+    def get(self, etag=None, client=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return (client or self.client).get(self.url, **headers)
+
+    def test_repeated_get_is_not_modified(self):
+        self.share_generations()
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.get('W/%s' % etag).status_code, 304)
+
+    def test_a_write_changes_the_etag(self):
+        self.share_generations()
+        etag = self.get()['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hotel.price = 95
+            self.hotel.save()
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['price'], '95.00')
+
+    def test_a_favorite_changes_the_etag_of_its_user(self):
+        self.share_generations()
+        user = CustomUser.objects.create_user('amira@example.com', 'Amira', 'Ben Salah', 'secret')
+        client = APIClient()
+        client.force_authenticate(user)
+        etag = client.get(self.url)['ETag']
+        self.assertEqual(self.get(etag, client).status_code, 304)
+        # The tag is per user: another one gets the full response
+        self.assertEqual(self.get(etag).status_code, 200)
+
+        Favorite.objects.create(user=user, entity_type='hotel', entity_id=self.hotel.pk)
+
+        response = self.get(etag, client)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_no_etag_on_per_process_generations(self):
+        # TEST_CACHES: a change handled by another worker would never change the tag
+        self.assertFalse(caching.generations_shared())
+        response = self.get('*')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
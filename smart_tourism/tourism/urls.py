@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import RestaurantViewSet, HotelViewSet, ActivityViewSet,ArchaeologicalSiteViewSet,DestinationViewSet,MuseumViewSet,FestivalViewSet,GuestHouseViewSet,ReviewViewSet,FavoriteViewSet
+from .views import SearchView, SuggestView, MapView, CatalogCacheStatsView
 
 # Create a router and register the endpoints
 router = DefaultRouter()
@@ -20,5 +21,9 @@ router.register(r'favorites', FavoriteViewSet, basename='favorite')
 
 # Define URL patterns for tourism app
 urlpatterns = [
+    path('search/', SearchView.as_view(), name='catalog-search'),
+    path('suggest/', SuggestView.as_view(), name='catalog-suggest'),
+    path('map/', MapView.as_view(), name='catalog-map'),
+    path('cache-stats/', CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
     path('', include(router.urls)),  # Include all router URLs
 ]
@@ -12,6 +12,16 @@ from rest_framework.response import Response
 from django.utils import timezone
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from .mixins import CatalogQuerysetMixin
+from .caching import CachedResponseMixin
+from .etags import ConditionalGetMixin
+from .models import Cuisine
+from .pagination import CatalogPagination
+from .models import CATALOG_MODELS
+from .serializers import CatalogCardSerializer, FavoriteEntitySerializer
+from django.db import transaction
+from . import caching, ratings, search, spatial, suggest
 
 import logging
 logger = logging.getLogger(__name__)
@@ -22,9 +32,12 @@ logger = logging.getLogger(__name__)
 from .models import Hotel
 from .serializers import HotelSerializer
 
-class HotelViewSet(viewsets.ModelViewSet):
+class HotelViewSet(ConditionalGetMixin, CachedResponseMixin, CatalogQuerysetMixin, viewsets.ModelViewSet):
     queryset = Hotel.objects.all()
     serializer_class = HotelSerializer
+    cache_dependencies = (Destination, Review, Equipment)
+    entity_type = 'hotel'
+    prefetch_related_fields = ('equipments',)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:  # Allow any user to view hotels
@@ -33,15 +46,13 @@ class HotelViewSet(viewsets.ModelViewSet):
         # For create, update, and delete actions, only allow admins
         return [IsAdmin()]
     def get_queryset(self):
-        queryset = Hotel.objects.all()
+        queryset = self.get_base_queryset()
 
-        # Search filters
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(description__icontains=search)
-            )
+        # Search by name or description, best matches first
+        queryset = self.filter_search(queryset)
+
+        # Things within radius_km of a point, nearest first
+        queryset = self.filter_near(queryset)
 
         # Filter by number of stars
         stars = self.request.query_params.get('stars', None)
@@ -54,7 +65,9 @@ class HotelViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(destination__name__icontains=destination_name)
 
         # Sorting by price (asc or desc)
-        sort_by = self.request.query_params.get('sort_by', 'price')  # Default sorting is by price
+        # Default sorting is by price, or by relevance / distance when searching
+        ranked = self.request.query_params.get('search') or self.request.query_params.get('near')
+        sort_by = self.request.query_params.get('sort_by', None if ranked else 'price')
         sort_direction = self.request.query_params.get('sort_direction', 'asc')  # Default to ascending order
 
         if sort_by == 'price':
@@ -66,57 +79,7 @@ class HotelViewSet(viewsets.ModelViewSet):
 
         return queryset
     
-    def create(self, request, *args, **kwargs):
-        """
-        Custom create method to handle equipments.
-        """
-        serializer = self.get_serializer(data=request.data)
-        if serializer.is_valid():
-            # Handle the custom create logic in the serializer
-            self.perform_create(serializer)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-    def update(self, request, *args, **kwargs):
-        """
-        Custom update method to handle equipments.
-        """
-        partial = kwargs.pop('partial', False)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        if serializer.is_valid():
-            self.perform_update(serializer)
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-    def perform_create(self, serializer):
-        """
-        Custom create method to handle equipment assignment after saving guest house.
-        """
-        hotel = serializer.save()
-        equipment_ids = self.request.data.get('equipments', [])  # Get the list of equipment IDs
-
-        for equipment_id in equipment_ids:
-            try:
-                # Get the equipment by ID
-                equipment = Equipment.objects.get(id=equipment_id)
-                hotel.equipments.add(equipment)
-            except Equipment.DoesNotExist:
-                pass  # Handle if equipment doesn't exist, maybe return an error message or log it
-
-    def perform_update(self, serializer):
-        """
-        Custom update method to handle equipment assignment when updating guest house.
-        """
-        hotel = serializer.save()
-        equipment_ids = self.request.data.get('equipments', [])
-        hotel.equipments.clear()  # Clear existing equipment associations
-        for equipment_id in equipment_ids:
-            try:
-                equipment = Equipment.objects.get(id=equipment_id)
-                hotel.equipments.add(equipment)
-            except Equipment.DoesNotExist:
-                pass  # Handle if equipment doesn't exist, maybe return an error message
+    # Equipments are validated and assigned in bulk by HotelSerializer
     
 
 # class RestaurantViewSet(viewsets.ModelViewSet):
@@ -161,9 +124,12 @@ class HotelViewSet(viewsets.ModelViewSet):
 
 
 
-class RestaurantViewSet(viewsets.ModelViewSet):
+class RestaurantViewSet(ConditionalGetMixin, CachedResponseMixin, CatalogQuerysetMixin, viewsets.ModelViewSet):
     queryset = Restaurant.objects.all()
     serializer_class = RestaurantSerializer
+    cache_dependencies = (Destination, Review, Cuisine)
+    entity_type = 'restaurant'
+    select_related_fields = ('destination', 'cuisine')
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -171,15 +137,13 @@ class RestaurantViewSet(viewsets.ModelViewSet):
         return [IsAdmin()]
 
     def get_queryset(self):
-        queryset = Restaurant.objects.all()
+        queryset = self.get_base_queryset()
         
-        # Search by name or description (category removed)
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(description__icontains=search)
-            )
+        # Search by name or description (category removed), best matches first
+        queryset = self.filter_search(queryset)
+
+        # Things within radius_km of a point, nearest first
+        queryset = self.filter_near(queryset)
 
         # Filter by forks
         forks = self.request.query_params.get('forks', None)
@@ -208,9 +172,11 @@ class RestaurantViewSet(viewsets.ModelViewSet):
     
 
     
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(ConditionalGetMixin, CachedResponseMixin, CatalogQuerysetMixin, viewsets.ModelViewSet):
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
+    cache_dependencies = (Destination, Review)
+    entity_type = 'activity'
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:  # Allow normal users to view
@@ -218,7 +184,13 @@ class ActivityViewSet(viewsets.ModelViewSet):
         return [IsAdmin()]
     
     def get_queryset(self):
-        queryset = Activity.objects.all()
+        queryset = self.get_base_queryset()
+
+        # Search by name or description, best matches first
+        queryset = self.filter_search(queryset)
+
+        # Things within radius_km of a point, nearest first
+        queryset = self.filter_near(queryset)
         
         # Get sorting direction from query params (default is ascending)
         sort_by = self.request.query_params.get('sort_by', None)
@@ -232,9 +204,11 @@ class ActivityViewSet(viewsets.ModelViewSet):
 
         return queryset
     
-class MuseumViewSet(viewsets.ModelViewSet):
+class MuseumViewSet(ConditionalGetMixin, CachedResponseMixin, CatalogQuerysetMixin, viewsets.ModelViewSet):
     queryset = Museum.objects.all()
     serializer_class = MuseumSerializer
+    cache_dependencies = (Destination, Review)
+    entity_type = 'museum'
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:  # Allow normal users to view
@@ -242,14 +216,13 @@ class MuseumViewSet(viewsets.ModelViewSet):
         return [IsAdmin()]
     
     def get_queryset(self):
-        queryset = Museum.objects.all()  # ✅ Initialize queryset first
+        queryset = self.get_base_queryset()  # ✅ Initialize queryset first
 
-        # Search by name or description
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
+        # Search by name or description, best matches first
+        queryset = self.filter_search(queryset)
+
+        # Things within radius_km of a point, nearest first
+        queryset = self.filter_near(queryset)
 
         # Get sorting direction from query params (default is ascending)
         sort_by = self.request.query_params.get('sort_by', None)
@@ -270,9 +243,11 @@ class MuseumViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class ArchaeologicalSiteViewSet(viewsets.ModelViewSet):
+class ArchaeologicalSiteViewSet(ConditionalGetMixin, CachedResponseMixin, CatalogQuerysetMixin, viewsets.ModelViewSet):
     queryset = ArchaeologicalSite.objects.all()
     serializer_class = ArchaeologicalSiteSerializer
+    cache_dependencies = (Destination, Review)
+    entity_type = 'archaeological_site'
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:  # Allow normal users to view
@@ -280,14 +255,13 @@ class ArchaeologicalSiteViewSet(viewsets.ModelViewSet):
         return [IsAdmin()]
     
     def get_queryset(self):
-        queryset = ArchaeologicalSite.objects.all()  # ✅ Initialize queryset first
+        queryset = self.get_base_queryset()  # ✅ Initialize queryset first
 
-        # Search by name or description
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
+        # Search by name or description, best matches first
+        queryset = self.filter_search(queryset)
+
+        # Things within radius_km of a point, nearest first
+        queryset = self.filter_near(queryset)
 
        
         # Filter by destination name
@@ -298,9 +272,11 @@ class ArchaeologicalSiteViewSet(viewsets.ModelViewSet):
         return queryset
     
 
-class FestivalViewSet(viewsets.ModelViewSet):
+class FestivalViewSet(ConditionalGetMixin, CachedResponseMixin, CatalogQuerysetMixin, viewsets.ModelViewSet):
     queryset = Festival.objects.all()
     serializer_class = FestivalSerializer
+    cache_dependencies = (Destination, Review)
+    entity_type = 'festival'
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:  # Allow normal users to view
@@ -308,14 +284,13 @@ class FestivalViewSet(viewsets.ModelViewSet):
         return [IsAdmin()] 
     
     def get_queryset(self):
-        queryset = Festival.objects.all()  # ✅ Initialize queryset first
+        queryset = self.get_base_queryset()  # ✅ Initialize queryset first
 
-        # Search by name or description
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
+        # Search by name or description, best matches first
+        queryset = self.filter_search(queryset)
+
+        # Things within radius_km of a point, nearest first
+        queryset = self.filter_near(queryset)
 
         # Get sorting direction from query params (default is ascending)
         sort_by = self.request.query_params.get('sort_by', None)
@@ -337,9 +312,12 @@ class FestivalViewSet(viewsets.ModelViewSet):
 
     
 
-class GuestHouseViewSet(viewsets.ModelViewSet):
+class GuestHouseViewSet(ConditionalGetMixin, CachedResponseMixin, CatalogQuerysetMixin, viewsets.ModelViewSet):
     queryset = GuestHouse.objects.all()
     serializer_class = GuestHouseSerializer
+    cache_dependencies = (Destination, Review, Equipment)
+    entity_type = 'guest_house'
+    prefetch_related_fields = ('equipments',)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:  # Allow normal users to view
@@ -347,14 +325,13 @@ class GuestHouseViewSet(viewsets.ModelViewSet):
         return [IsAdmin()]
     
     def get_queryset(self):
-        queryset = GuestHouse.objects.all()  # ✅ Initialize queryset first
+        queryset = self.get_base_queryset()  # ✅ Initialize queryset first
 
-        # Search by name or description
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
+        # Search by name or description, best matches first
+        queryset = self.filter_search(queryset)
+
+        # Things within radius_km of a point, nearest first
+        queryset = self.filter_near(queryset)
 
         # Get sorting direction from query params (default is ascending)
         sort_by = self.request.query_params.get('sort_by', None)
@@ -373,64 +350,15 @@ class GuestHouseViewSet(viewsets.ModelViewSet):
 
         return queryset
     
-    def create(self, request, *args, **kwargs):
-        """
-        Custom create method to handle equipments.
-        """
-        serializer = self.get_serializer(data=request.data)
-        if serializer.is_valid():
-            # Handle the custom create logic in the serializer
-            self.perform_create(serializer)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-    def update(self, request, *args, **kwargs):
-        """
-        Custom update method to handle equipments.
-        """
-        partial = kwargs.pop('partial', False)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        if serializer.is_valid():
-            self.perform_update(serializer)
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-    def perform_create(self, serializer):
-        """
-        Custom create method to handle equipment assignment after saving guest house.
-        """
-        guest_house = serializer.save()
-        equipment_ids = self.request.data.get('equipments', [])  # Get the list of equipment IDs
-
-        for equipment_id in equipment_ids:
-            try:
-                # Get the equipment by ID
-                equipment = Equipment.objects.get(id=equipment_id)
-                guest_house.equipments.add(equipment)
-            except Equipment.DoesNotExist:
-                pass  # Handle if equipment doesn't exist, maybe return an error message or log it
-
-    def perform_update(self, serializer):
-        """
-        Custom update method to handle equipment assignment when updating guest house.
-        """
-        guest_house = serializer.save()
-        equipment_ids = self.request.data.get('equipments', [])
-        guest_house.equipments.clear()  # Clear existing equipment associations
-        for equipment_id in equipment_ids:
-            try:
-                equipment = Equipment.objects.get(id=equipment_id)
-                guest_house.equipments.add(equipment)
-            except Equipment.DoesNotExist:
-                pass  # Handle if equipment doesn't exist, maybe return an error message
+    # Equipments are validated and assigned in bulk by GuestHouseSerializer
     
 
     
 
-class DestinationViewSet(viewsets.ModelViewSet):
+class DestinationViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Destination.objects.all()
     serializer_class = DestinationSerializer
+    pagination_class = CatalogPagination
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:  # Allow normal users to view
@@ -447,7 +375,7 @@ class DestinationViewSet(viewsets.ModelViewSet):
         return queryset
     
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows users and admins to manage reviews.
     - Users and admins can create, update, and delete their own reviews.
@@ -457,6 +385,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
     """
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = CatalogPagination
     permission_classes = [IsAuthenticatedOrReadOnly, IsReviewOwnerOrAdmin]
 
     def get_queryset(self):
@@ -506,37 +435,207 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
 
 
+def load_entities(pairs):
+    """
+    Load catalog rows from (entity_type, entity_id) pairs with one id__in
+    query per entity type, ready for CatalogCardSerializer.
+    Returns {(entity_type, entity_id): obj}; unknown or deleted rows are missing.
+    """
+    ids_by_type = {}
+    for entity_type, entity_id in pairs:
+        if entity_type in CATALOG_MODELS:
+            ids_by_type.setdefault(entity_type, []).append(entity_id)
+
+    entities = {}
+    for entity_type, ids in ids_by_type.items():
+        queryset = ratings.annotate_ratings(CATALOG_MODELS[entity_type].objects.select_related('destination'), entity_type)
+        for pk, obj in queryset.in_bulk(ids).items():
+            entities[(entity_type, pk)] = obj
+    return entities
+
+
 class FavoriteViewSet(viewsets.GenericViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = FavoriteSerializer
+    pagination_class = CatalogPagination
 
     def get_queryset(self):
         # Only return favorites for the authenticated user
         return Favorite.objects.filter(user=self.request.user)
 
+    def list(self, request):
+        """
+        The user's favorites as catalog cards, most recent first, optionally
+        filtered by ?entity_type=. Each page is loaded with one query per entity type.
+        """
+        queryset = self.get_queryset().order_by('-created_at', '-id')
+        entity_type = request.query_params.get('entity_type')
+        if entity_type:
+            queryset = queryset.filter(entity_type=entity_type)
+
+        page = self.paginate_queryset(queryset)
+        entities = load_entities((favorite.entity_type, favorite.entity_id) for favorite in page)
+        results = []
+        for favorite in page:
+            obj = entities.get((favorite.entity_type, favorite.entity_id))
+            if obj is None:
+                continue  # The entity was deleted
+            results.append({
+                'entity_type': favorite.entity_type,
+                'favorited_at': favorite.created_at,
+                **CatalogCardSerializer(obj).data,
+            })
+        return self.get_paginated_response(results)
+
     @action(detail=False, methods=['post'])
     def add_to_favorite(self, request):
-        entity_type = request.data.get('entity_type')
-        entity_id = request.data.get('entity_id')
+        serializer = FavoriteEntitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        # Check if the favorite already exists
-        if Favorite.objects.filter(user=request.user, entity_type=entity_type, entity_id=entity_id).exists():
-            return Response({'error': 'This item is already in your favorites.'}, status=400)
-
-        # Create the favorite entry
-        Favorite.objects.create(user=request.user, entity_type=entity_type, entity_id=entity_id)
+        # Single insert, an existing favorite is left as is by the unique constraint
+        Favorite.objects.bulk_create(
+            [Favorite(user=request.user, **serializer.validated_data)], ignore_conflicts=True
+        )
         return Response({'message': 'Item added to favorites successfully!'}, status=201)
 
     @action(detail=False, methods=['post'])
     def remove_from_favorite(self, request):
-        entity_type = request.data.get('entity_type')
-        entity_id = request.data.get('entity_id')
+        serializer = FavoriteEntitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # Single delete, removing a missing favorite is not an error
+        deleted, _ = Favorite.objects.filter(user=request.user, **serializer.validated_data).delete()
+        if not deleted:
+            return Response({'message': 'This item is not in your favorites.'}, status=200)
+        return Response({'message': 'Item removed from favorites successfully!'}, status=200)
+
+    @action(detail=False, methods=['post'])
+    def sync_favorites(self, request):
+        """
+        Replace the user's favorites with the client's full set:
+        POST {"favorites": [{"entity_type": "hotel", "entity_id": 3}, ...]}
+        Only the difference is written, in one transaction.
+        """
+        favorites = request.data.get('favorites') if hasattr(request.data, 'get') else None
+        serializer = FavoriteEntitySerializer(data=favorites, many=True)
+        serializer.is_valid(raise_exception=True)
+        wanted = {(item['entity_type'], item['entity_id']) for item in serializer.validated_data}
+
+        with transaction.atomic():
+            current = set(self.get_queryset().values_list('entity_type', 'entity_id'))
+            to_add = wanted - current
+            to_remove = current - wanted
+
+            Favorite.objects.bulk_create(
+                [Favorite(user=request.user, entity_type=entity_type, entity_id=entity_id)
+                 for entity_type, entity_id in to_add],
+                ignore_conflicts=True,
+            )
+            if to_remove:
+                ids_by_type = {}
+                for entity_type, entity_id in to_remove:
+                    ids_by_type.setdefault(entity_type, []).append(entity_id)
+                removed = Q()
+                for entity_type, ids in ids_by_type.items():
+                    removed |= Q(entity_type=entity_type, entity_id__in=ids)
+                self.get_queryset().filter(removed).delete()
+
+        return Response({'added': len(to_add), 'removed': len(to_remove), 'count': len(wanted)})
+
+
+
+class SearchView(APIView):
+    """
+    Search every catalog type at once: GET /api/tourism/search/?q=...
 
+    Hits of all types are ranked together by relevance in a single index query,
+    then the requested page is loaded with one query per entity type present in it.
+    Optional ?types=hotel,museum restricts the entity types.
+    """
+    permission_classes = [permissions.AllowAny]
+    pagination_class = CatalogPagination
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'The q parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        types = request.query_params.get('types')
+        hits = search.rank(query, types.split(',') if types else None)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(hits, request, view=self)
+
+        entities = load_entities((entity_type, entity_id) for entity_type, entity_id, _ in page)
+        results = []
+        for entity_type, entity_id, score in page:
+            obj = entities.get((entity_type, entity_id))
+            if obj is None:
+                continue  # Deleted since it was indexed
+            results.append({'entity_type': entity_type, 'score': score, **CatalogCardSerializer(obj).data})
+        return paginator.get_paginated_response(results)
+
+
+
+class SuggestView(APIView):
+    """
+    Typeahead: GET /api/tourism/suggest/?prefix=sidi bo
+    Matches every word of the prefix against the words of the catalog and
+    destination names, accents ignored, from an in-memory index.
+    Optional ?types=hotel,destination and ?limit= (at most 20).
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
         try:
-            # Find and delete the favorite entry
-            favorite = Favorite.objects.get(user=request.user, entity_type=entity_type, entity_id=entity_id)
-            favorite.delete()
-            return Response({'message': 'Item removed from favorites successfully!'}, status=200)
-        except Favorite.DoesNotExist:
-            return Response({'error': 'This item is not in your favorites.'}, status=404)
+            limit = max(1, min(int(request.query_params.get('limit', 10)), suggest.MAX_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        types = request.query_params.get('types')
+        entity_types = frozenset(types.split(',')) if types else None
+
+        matches = suggest.index.suggest(request.query_params.get('prefix', ''), limit, entity_types)
+        return Response({
+            'results': [
+                {'entity_type': entity_type, 'id': entity_id, 'name': name}
+                for entity_type, entity_id, name in matches
+            ]
+        })
+
+
+
+class MapView(APIView):
+    """
+    Markers of a map viewport: GET /api/tourism/map/?bbox=min_lon,min_lat,max_lon,max_lat&zoom=
+    Returns compact [lat, lon, count, id] tuples per entity type, clustered
+    server-side on a grid that gets finer as the zoom grows. Optional
+    ?types=hotel,museum restricts the entity types.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in request.query_params['bbox'].split(','))
+            zoom = int(request.query_params.get('zoom', 6))
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Expected bbox=min_lon,min_lat,max_lon,max_lat and an integer zoom.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if min_lat > max_lat or min_lon > max_lon:
+            return Response({'error': 'Invalid bbox.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        types = request.query_params.get('types')
+        entity_types = sorted(set(types.split(',')) & set(CATALOG_MODELS)) if types else sorted(CATALOG_MODELS)
+
+        clusters = spatial.map_clusters(min_lat, min_lon, max_lat, max_lon, zoom, entity_types)
+        return Response({'zoom': zoom, 'clustered': spatial.cluster_precision(zoom) is not None, 'markers': clusters})
+
+
+
+class CatalogCacheStatsView(APIView):
+    """Hit rate of the anonymous catalog response cache in this process (admin only)."""
+    permission_classes = [IsAuthenticated, IsAdmin]
 
+    def get(self, request):
+        return Response(caching.stats.as_dict())
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from tourism.prefixes import start_on_first_request
+        from .suggestions import suggestions
+
+        start_on_first_request(suggestions)
@@ -0,0 +1,181 @@
+"""
+Buffered click tracking.
+
+TrackClickView only appends the click to an in-process queue; a background
+thread writes the queued clicks with one bulk_create every FLUSH_INTERVAL_MS
+or BATCH_SIZE clicks, whichever comes first. Repeated clicks of a user on the
+same entity within DEDUPE_MINUTES (the window of
+ClickHistory.user_recently_clicked) are dropped in memory before they reach
+the queue. The queue is drained at interpreter exit.
+
+Settings (settings.CLICK_TRACKING): FLUSH_INTERVAL_MS, BATCH_SIZE, MAX_QUEUE,
+DEDUPE_MINUTES.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of ClickBuffer.record()
+QUEUED = 'queued'
+DUPLICATE = 'duplicate'
+DROPPED = 'dropped'
+
+
+class ClickBuffer:
+    def __init__(self, flush_interval_ms=500, batch_size=200, max_queue=10000, dedupe_minutes=10):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.dedupe_seconds = dedupe_minutes * 60
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._recent = {}  # (user id, entity type, entity id) -> time of the last recorded click
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.recorded = 0  # Queued
+        self.duplicates = 0
+        self.dropped = 0  # Queue full, not recorded
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+
+    def record(self, user_id, entity_type, entity_id):
+        """
+        Queue a click. Returns QUEUED, DUPLICATE when it repeats a recent click
+        of the user, or DROPPED when the queue is full: a dropped click is not
+        remembered, so the user's next click on the entity is queued again.
+        """
+        key = (user_id, entity_type, entity_id)
+        clicked = time.monotonic()
+        with self._lock:
+            last = self._recent.get(key)
+            if last is not None and clicked - last < self.dedupe_seconds:
+                self.duplicates += 1
+                return DUPLICATE
+            try:
+                self._queue.put_nowait(key)
+            except queue.Full:
+                self.dropped += 1
+                dropped = True
+            else:
+                dropped = False
+                self._recent[key] = clicked
+                if len(self._recent) > 10 * self._queue.maxsize:
+                    self._forget_old(clicked)
+                self.recorded += 1
+
+        if dropped:
+            logger.warning("Click queue full, dropping click on %s #%s.", entity_type, entity_id)
+            return DROPPED
+        self._ensure_worker()
+        return QUEUED
+
+    def _forget_old(self, now):
+        expired = [key for key, clicked in self._recent.items() if now - clicked >= self.dedupe_seconds]
+        for key in expired:
+            del self._recent[key]
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='click-buffer', daemon=True)
+                self._thread.start()
+                atexit.register(self.drain)
+
+    def _next_batch(self):
+        """Wait for up to batch_size clicks, or until the flush interval has passed."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+                close_old_connections()
+        close_old_connections()
+
+    def _write(self, batch):
+        from users.models import ClickHistory  # Import inside to avoid circular import issues
+
+        started = time.perf_counter()
+        try:
+            ClickHistory.objects.bulk_create([
+                ClickHistory(user_id=user_id, entity_type=entity_type, entity_id=entity_id)
+                for user_id, entity_type, entity_id in batch
+            ])
+        except Exception:
+            logger.exception("Could not write %d clicks.", len(batch))
+            with self._lock:
+                self.failed += len(batch)
+        else:
+            with self._lock:
+                self.written += len(batch)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def drain(self, timeout=5):
+        """Stop the worker and write whatever is still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) == self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'recorded': self.recorded,
+                'duplicates': self.duplicates,
+                'dropped': self.dropped,
+                'written': self.written,
+                'failed': self.failed,
+                'flushes': self.flushes,
+                'last_flush_ms': self.last_flush_ms,
+                'max_flush_ms': self.max_flush_ms,
+                'worker_alive': self._thread is not None and self._thread.is_alive(),
+            }
+
+
+_settings = getattr(settings, 'CLICK_TRACKING', {})
+
+buffer = ClickBuffer(
+    flush_interval_ms=_settings.get('FLUSH_INTERVAL_MS', 500),
+    batch_size=_settings.get('BATCH_SIZE', 200),
+    max_queue=_settings.get('MAX_QUEUE', 10000),
+    dedupe_minutes=_settings.get('DEDUPE_MINUTES', 10),
+)
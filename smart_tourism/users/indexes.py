@@ -0,0 +1,24 @@
+"""
+Access paths of the hot history lookups.
+
+Django never creates indexes for `managed = False` models: the migrations
+users.0010_history_indexes and 0011_search_history_unique_term create those of
+the unmanaged history tables with their own SQL. The models declare the same
+indexes in Meta, so the tables built outside the migrations (tests) get them
+too. The managed tables declare theirs in Meta.indexes.
+"""
+from django.db import connection
+
+
+def explain(queryset):
+    """Query plan of a queryset, as text."""
+    return queryset.explain()
+
+
+def uses_index(queryset, index_name):
+    """Whether the planner reads the queryset through the given index."""
+    return index_name in explain(queryset)
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+# The history tables are unmanaged: their indexes are created here, only when
+# the table exists. The SQL is written out rather than read from the models'
+# Meta, so a later change there cannot change what this migration did.
+INDEXES = [
+    ('click_history_user_entity_idx', 'click_history', '(user_id, entity_type, entity_id, clicked_at)'),
+    ('search_history_user_term_idx', 'search_history', '(user_id, entity_type, search_term)'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    tables = set(schema_editor.connection.introspection.table_names())
+    for name, table, columns in INDEXES:
+        if table in tables:
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} {columns}')
+
+
+def drop_indexes(apps, schema_editor):
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_alter_preference_table_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# users.suggestions.save_search inserts with ON CONFLICT (user_id, entity_type,
+# search_term): the unique index is its conflict target. The duplicates saved
+# before it are deleted first, keeping the earliest search of each; reversing
+# the migration does not bring them back.
+DELETE_DUPLICATES_SQL = """
+DELETE FROM search_history
+WHERE id NOT IN (
+    SELECT MIN(id) FROM search_history GROUP BY user_id, entity_type, search_term
+)
+"""
+
+
+def has_search_history(schema_editor):
+    return 'search_history' in schema_editor.connection.introspection.table_names()
+
+
+def make_terms_unique(apps, schema_editor):
+    if not has_search_history(schema_editor):
+        return
+    schema_editor.execute(DELETE_DUPLICATES_SQL)
+    schema_editor.execute(
+        'CREATE UNIQUE INDEX IF NOT EXISTS search_history_user_term_uniq '
+        'ON search_history (user_id, entity_type, search_term)'
+    )
+    # Same columns: the unique index serves its lookups
+    schema_editor.execute('DROP INDEX IF EXISTS search_history_user_term_idx')
+
+
+def restore_plain_index(apps, schema_editor):
+    if has_search_history(schema_editor):
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS search_history_user_term_idx '
+            'ON search_history (user_id, entity_type, search_term)'
+        )
+    schema_editor.execute('DROP INDEX IF EXISTS search_history_user_term_uniq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(make_terms_unique, restore_plain_index),
+    ]
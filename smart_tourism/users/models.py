@@ -104,6 +104,10 @@ class ClickHistory(models.Model):
     class Meta:
         managed = False  # Prevents Django from creating/modifying the table
         db_table = "click_history"  # Matches the existing PostgreSQL table name
+        # Created by users.0010_history_indexes; declared for the tables built outside the migrations (tests)
+        indexes = [
+            models.Index(fields=['user', 'entity_type', 'entity_id', 'clicked_at'], name='click_history_user_entity_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} clicked on {self.entity_type} (ID: {self.entity_id})"
@@ -111,7 +111,7 @@ class AdminUserSerializer(serializers.ModelSerializer):
 
 
 class ClickHistorySerializer(serializers.Serializer):
-    entity_type = serializers.CharField(max_length=100)
+    entity_type = serializers.CharField(max_length=50)
     entity_id = serializers.IntegerField()
 
     def validate_entity_type(self, value):
@@ -0,0 +1,98 @@
+"""
+Popular searches per entity type.
+
+The SearchHistory terms are counted in memory (number of users who searched
+each term), with the terms of every entity type kept in a sorted list so a
+prefix is a bisect range. The store is built in the background
+(tourism.prefixes) from one GROUP BY query, updated on every saved search and
+rebuilt every RELOAD_SECONDS to pick up the searches saved by other processes.
+"""
+import heapq
+from bisect import insort
+
+from django.db import connection
+from django.db.models import Count
+from django.utils.timezone import now
+
+from tourism.prefixes import MEMO_PREFIX_LENGTH, PrefixIndex, prefix_range
+
+from .models import SearchHistory
+
+RELOAD_SECONDS = 5 * 60
+
+
+def normalize_term(term):
+    return ' '.join(term.lower().split())
+
+
+class SearchSuggestions(PrefixIndex):
+    name = 'popular searches'
+
+    def __init__(self, reload_seconds=RELOAD_SECONDS):
+        super().__init__(reload_seconds)
+        self._terms = {}  # entity type -> sorted terms
+        self._counts = {}  # entity type -> {term: count}
+
+    def build(self):
+        counts = {}
+        rows = SearchHistory.objects.values_list('entity_type', 'search_term').annotate(count=Count('id')).order_by()
+        for entity_type, term, count in rows:
+            term = normalize_term(term)
+            type_counts = counts.setdefault(entity_type, {})
+            type_counts[term] = type_counts.get(term, 0) + count
+        return {entity_type: sorted(type_counts) for entity_type, type_counts in counts.items()}, counts
+
+    def install(self, data):
+        self._terms, self._counts = data
+
+    def add(self, entity_type, term):
+        """Count one more user searching the term."""
+        if not self.loaded:
+            return  # The coming build reads it
+        term = normalize_term(term)
+        with self._lock:
+            type_counts = self._counts.setdefault(entity_type, {})
+            if term not in type_counts:
+                insort(self._terms.setdefault(entity_type, []), term)
+            type_counts[term] = type_counts.get(term, 0) + 1
+            for length in range(min(len(term), MEMO_PREFIX_LENGTH) + 1):
+                prefix = term[:length]
+                for key in [key for key in self._memo if key[:2] == (entity_type, prefix)]:
+                    del self._memo[key]
+
+    def top(self, entity_type, prefix='', limit=10):
+        """Return [(term, count)] of the most searched terms starting with prefix."""
+        self.start()
+        prefix = normalize_term(prefix)
+        return self.memoised((entity_type, prefix, limit), prefix, lambda: self._top(entity_type, prefix, limit))
+
+    def _top(self, entity_type, prefix, limit):
+        terms = self._terms.get(entity_type, [])
+        counts = self._counts.get(entity_type, {})
+        low, high = prefix_range(terms, prefix)
+        best = heapq.nlargest(limit, terms[low:high], key=counts.__getitem__)  # Ties stay alphabetical
+        return [(term, counts[term]) for term in best]
+
+
+suggestions = SearchSuggestions()
+
+
+def save_search(user, entity_type, search_term):
+    """
+    Insert the search into the user's history in one statement, skipping
+    duplicates through the search_history_user_term_uniq unique index
+    (users.0011 migration; PostgreSQL, or SQLite 3.35+ for RETURNING). Without
+    that index the conflict target is rejected instead of inserting duplicates.
+    Returns True when the search is new for the user: the popular searches
+    count each user once per term.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO search_history (user_id, entity_type, search_term, searched_at) '
+            'VALUES (%s, %s, %s, %s) ON CONFLICT (user_id, entity_type, search_term) DO NOTHING RETURNING id',
+            [user.pk, entity_type, search_term, now()],
+        )
+        created = cursor.fetchone() is not None
+    if created:
+        suggestions.add(entity_type, search_term)
+    return created
@@ -1,3 +1,132 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.utils.timezone import now
+
+from tourism.models import Destination, Favorite, Review
+from tourism.tests import UnmanagedTablesMixin
+from users.indexes import is_postgresql, uses_index
+from users import clicks, suggestions
+from users.models import ClickHistory, CustomUser, SearchHistory
+
+# Unmanaged tables behind the user history, in creation order (users point at their location)
+HISTORY_TABLES = (Destination, CustomUser, ClickHistory, SearchHistory)
+
+
+class AccessPathIndexTests(UnmanagedTablesMixin, TestCase):
+    """The hot polymorphic lookups are planned through their indexes."""
+    unmanaged_models = HISTORY_TABLES
+
+    def setUp(self):
+        if is_postgresql():
+            # The test tables are nearly empty: make sequential scans a last resort
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_review_by_entity(self):
+        queryset = Review.objects.filter(entity_type='hotel', entity_id=1)
+        self.assertTrue(uses_index(queryset, 'review_entity_idx'))
+
+    def unique_index(self, model, columns):
+        """Name of the unique index Django generated on the columns."""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+        return next(name for name, info in constraints.items() if info['unique'] and info['columns'] == columns)
+
+    def test_favorite_lookup(self):
+        # is_favorite / favorite toggles: served by the unique (user, entity_type, entity_id) index
+        queryset = Favorite.objects.filter(user_id=1, entity_type='hotel', entity_id=1)
+        self.assertTrue(uses_index(queryset, self.unique_index(Favorite, ['user_id', 'entity_type', 'entity_id'])))
+
+    def test_recent_click(self):
+        queryset = ClickHistory.objects.filter(
+            user_id=1, entity_type='hotel', entity_id=1, clicked_at__gte=now() - timedelta(minutes=10)
+        )
+        self.assertTrue(uses_index(queryset, 'click_history_user_entity_idx'))
+
+    def test_search_history_duplicate_check(self):
+        # save_search's conflict target: the unique (user, entity_type, search_term) index
+        queryset = SearchHistory.objects.filter(user_id=1, entity_type='hotel', search_term='sousse')
+        unique_index = self.unique_index(SearchHistory, ['user_id', 'entity_type', 'search_term'])
+        self.assertTrue(uses_index(queryset, unique_index))
+
+
+class SaveSearchTests(UnmanagedTablesMixin, TestCase):
+    unmanaged_models = HISTORY_TABLES
+
+    def setUp(self):
+        self.amira = CustomUser.objects.create_user('amira@example.com', 'Amira', 'Ben Salah', 'secret')
+        self.karim = CustomUser.objects.create_user('karim@example.com', 'Karim', 'Trabelsi', 'secret')
+        # A fresh store, built like the background thread would
+        self.store = suggestions.SearchSuggestions()
+        self.store.refresh()
+        patcher = mock.patch.object(suggestions, 'suggestions', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_created_only_once_per_user(self):
+        self.assertTrue(suggestions.save_search(self.amira, 'hotel', 'Sousse'))
+        self.assertFalse(suggestions.save_search(self.amira, 'hotel', 'Sousse'))
+        self.assertTrue(suggestions.save_search(self.karim, 'hotel', 'Sousse'))
+        self.assertTrue(suggestions.save_search(self.amira, 'museum', 'Sousse'))
+
+        self.assertEqual(SearchHistory.objects.filter(entity_type='hotel', search_term='Sousse').count(), 2)
+        # One count per user who searched the term
+        self.assertEqual(self.store.top('hotel', 'sou'), [('sousse', 2)])
+        self.assertEqual(self.store.top('museum', 'sou'), [('sousse', 1)])
+
+    def test_store_rebuilt_from_the_history(self):
+        for user, term in [(self.amira, 'Sousse'), (self.karim, 'Sousse'), (self.karim, 'Sidi Bou Said')]:
+            suggestions.save_search(user, 'destination', term)
+
+        rebuilt = suggestions.SearchSuggestions()
+        rebuilt.refresh()
+        self.assertEqual(rebuilt.top('destination', 's'), self.store.top('destination', 's'))
+        self.assertEqual(rebuilt.top('destination', 's'), [('sousse', 2), ('sidi bou said', 1)])
+
+
+class ClickBufferTests(UnmanagedTablesMixin, TestCase):
+    unmanaged_models = HISTORY_TABLES
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('amira@example.com', 'Amira', 'Ben Salah', 'secret')
+
+    def make_buffer(self, **options):
+        # Flushed by drain() on the test thread, inside the test transaction
+        buffer = clicks.ClickBuffer(**options)
+        patcher = mock.patch.object(buffer, '_ensure_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return buffer
+
+    def test_repeated_click_is_written_once(self):
+        buffer = self.make_buffer()
+        self.assertEqual(buffer.record(self.user.pk, 'hotel', 1), clicks.QUEUED)
+        self.assertEqual(buffer.record(self.user.pk, 'hotel', 1), clicks.DUPLICATE)
+        self.assertEqual(buffer.record(self.user.pk, 'restaurant', 1), clicks.QUEUED)
+
+        buffer.drain()
+
+        rows = ClickHistory.objects.filter(user=self.user).values_list('entity_type', 'entity_id')
+        self.assertCountEqual(rows, [('hotel', 1), ('restaurant', 1)])
+        stats = buffer.stats()
+        self.assertEqual((stats['recorded'], stats['duplicates'], stats['written']), (2, 1, 2))
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_click_dropped_on_a_full_queue_is_not_remembered(self):
+        buffer = self.make_buffer(max_queue=1)
+        self.assertEqual(buffer.record(self.user.pk, 'hotel', 1), clicks.QUEUED)
+        self.assertEqual(buffer.record(self.user.pk, 'hotel', 2), clicks.DROPPED)
+        stats = buffer.stats()
+        self.assertEqual((stats['recorded'], stats['dropped']), (1, 1))
+
+        buffer.drain()
+        # Not a duplicate: the dropped click was never queued
+        self.assertEqual(buffer.record(self.user.pk, 'hotel', 2), clicks.QUEUED)
+        buffer.drain()
 
-# Create your tests here.
+        rows = ClickHistory.objects.filter(user=self.user).values_list('entity_id', flat=True)
+        self.assertCountEqual(rows, [1, 2])
+        self.assertEqual(buffer.stats()['written'], 2)
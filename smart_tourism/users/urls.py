@@ -2,7 +2,7 @@ from django.urls import path, include
 from . import views  # Import the views you defined
 from rest_framework.routers import DefaultRouter
 from .views import UserViewSet
-from .views import TrackClickView, SaveSearchView, PreferenceViewSet
+from .views import TrackClickView, ClickTrackingStatsView, SaveSearchView, PopularSearchesView, PreferenceViewSet
 
 
 # Create a router and register our viewset with it
@@ -20,6 +20,8 @@ urlpatterns = [
     # path('users/', include(router.urls)),
     path("users/<int:pk>/block/", UserViewSet.as_view({"post": "block_user"})),
     path('track-click/', TrackClickView.as_view(), name='track-click'),
+    path('track-click/stats/', ClickTrackingStatsView.as_view(), name='track-click-stats'),
     path('save-search/', SaveSearchView.as_view(), name='save-search'),
+    path('popular-searches/', PopularSearchesView.as_view(), name='popular-searches'),
     path('', include(router.urls)),
 ]
@@ -30,6 +30,8 @@ from rest_framework import viewsets, permissions
 from .models import Preference
 from .serializers import PreferenceSerializer
 from .permissions import IsAdminOrCreateOnly  # your custom permission
+from .serializers import ClickHistorySerializer, VALID_ENTITY_TYPES
+from . import clicks, suggestions
 
 
 
@@ -210,18 +212,30 @@ class TrackClickView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        user = request.user
-        entity_type = request.data.get('entity_type')
-        entity_id = request.data.get('entity_id')
+        serializer = ClickHistorySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        # Check if the user has recently clicked the same entity
-        if ClickHistory.user_recently_clicked(user, entity_type, entity_id):
-            return Response({"message": "Click already recorded recently."}, status=200)
+        # Queued and written in batches in the background; clicks on the same
+        # entity within the last 10 minutes are dropped in memory
+        outcome = clicks.buffer.record(
+            request.user.id,
+            serializer.validated_data['entity_type'],
+            serializer.validated_data['entity_id'],
+        )
+        if outcome == clicks.DROPPED:
+            return Response({"message": "Click tracking is overloaded, try again later."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        message = "Click accepted." if outcome == clicks.QUEUED else "Click already recorded recently."
+        return Response({"message": message}, status=status.HTTP_202_ACCEPTED)
+
+
+class ClickTrackingStatsView(APIView):
+    """Queue depth, flush latency and counters of the click buffer (admin only)."""
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response(clicks.buffer.stats())
 
-        # Save the click if it's a new one
-        ClickHistory.objects.create(user=user, entity_type=entity_type, entity_id=entity_id)
-        return Response({"message": "Click recorded successfully!"}, status=201)
-    
 
 
 
@@ -237,33 +251,41 @@ class SaveSearchView(APIView):
         search_term = serializer.validated_data['q']
         entity_type = serializer.validated_data['entity_type']
 
-        # Check for existing search history
-        if SearchHistory.objects.filter(user=request.user, entity_type=entity_type, search_term=search_term).exists():
-            return Response({'message': 'Search history already exists'}, status=status.HTTP_200_OK)
-
-        # Create new search history
-        SearchHistory.objects.create(
-            user=request.user,
-            entity_type=entity_type,
-            search_term=search_term
-        )
-
-        # Fetch matching search results
-        search_results = SearchHistory.objects.filter(
-            Q(entity_type=entity_type) & Q(search_term__icontains=search_term)
-        )
+        # Single insert, duplicates are skipped by the unique constraint
+        created = suggestions.save_search(request.user, entity_type, search_term)
+        message = 'Search term saved successfully' if created else 'Search history already exists'
 
+        # Popular searches starting with the term, from the in-memory store
         return Response({
-            'message': 'Search term saved successfully',
+            'message': message,
             'search_results': [
-                {
-                    'search_term': result.search_term,
-                    'entity_type': result.entity_type,
-                    'searched_at': result.searched_at.strftime('%Y-%m-%d %H:%M:%S')
-                }
-                for result in search_results
+                {'search_term': term, 'entity_type': entity_type, 'count': count}
+                for term, count in suggestions.suggestions.top(entity_type, search_term)
             ]
         }, status=status.HTTP_200_OK)
+
+
+class PopularSearchesView(APIView):
+    """GET /api/popular-searches/?entity_type=hotel&prefix=sou&limit=10"""
+    permission_classes = [IsAuthenticated]
+    max_limit = 50
+
+    def get(self, request):
+        entity_type = request.query_params.get('entity_type', '').strip().lower()
+        if entity_type not in VALID_ENTITY_TYPES:
+            return Response({'error': 'Invalid entity type.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), self.max_limit)
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        prefix = request.query_params.get('prefix', '')
+        return Response({
+            'results': [
+                {'search_term': term, 'count': count}
+                for term, count in suggestions.suggestions.top(entity_type, prefix, max(limit, 1))
+            ]
+        })
     
 
 